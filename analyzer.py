@@ -1,8 +1,8 @@
 import streamlit as st
-import anthropic
 import docx
 import io
-from products import analyze_text_for_products, generate_product_suggestion, filter_recommendations_by_quality
+from products import analyze_text_for_products, generate_product_suggestion, generate_product_suggestions, filter_recommendations_by_quality, MAX_SUGGESTION_WORKERS
+from clients import get_anthropic_client
 
 def show_analyzer_tab(api_keys, produkty_db, products_loaded):
     """Show the text analyzer tab"""
@@ -112,6 +112,7 @@ def show_analyzer_tab(api_keys, produkty_db, products_loaded):
                     # Store in session state
                     st.session_state.analyzed_text = text_to_analyze
                     st.session_state.product_recommendations = filtered_recommendations
+                    st.session_state.rejected_suggestions = set()
                     
                     st.rerun()
                     
@@ -129,6 +130,69 @@ def show_analyzer_tab(api_keys, produkty_db, products_loaded):
         else:
             st.success(f"✅ Znaleziono {len(st.session_state.product_recommendations)} dobrze dopasowanych możliwości!")
             
+            # Generate all missing suggestions at once - products Claude rejected for their paragraph are not resent
+            rejected_suggestions = st.session_state.setdefault('rejected_suggestions', set())
+            missing = [
+                (i, rec) for i, rec in enumerate(st.session_state.product_recommendations)
+                if f"suggestion_{i}" not in st.session_state and i not in rejected_suggestions
+            ]
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                max_workers = st.number_input(
+                    "⚙️ Równoległe zapytania",
+                    min_value=1,
+                    max_value=10,
+                    value=MAX_SUGGESTION_WORKERS,
+                    help="Ile sugestii generować jednocześnie"
+                )
+                use_llm_cache = st.checkbox(
+                    "♻️ Używaj zapisanych odpowiedzi AI",
+                    value=True,
+                    key="analyzer_use_llm_cache",
+                    help="Identyczne zapytania do Claude są obsługiwane z lokalnego cache bez ponownego wywołania API. Wyłącz, aby wymusić nowe sugestie."
+                )
+            with col2:
+                st.markdown("<br>", unsafe_allow_html=True)
+                generate_all_button = st.button(
+                    f"✨ Generuj wszystkie ({len(missing)})",
+                    disabled=not missing,
+                    use_container_width=True
+                )
+            
+            if generate_all_button and missing:
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                rejected = 0
+                failed = 0
+                try:
+                    anthropic_client = get_anthropic_client(api_keys['anthropic'])
+                    for done, (i, suggestion) in enumerate(
+                        generate_product_suggestions(missing, anthropic_client, max_workers=int(max_workers), use_cache=use_llm_cache), 1
+                    ):
+                        if suggestion.startswith("Błąd generowania sugestii"):
+                            failed += 1
+                        elif is_rejected_suggestion(suggestion):
+                            rejected += 1
+                            rejected_suggestions.add(i)
+                        else:
+                            st.session_state[f"suggestion_{i}"] = suggestion
+                        progress_bar.progress(done / len(missing))
+                        status_text.text(f"✨ Wygenerowano {done}/{len(missing)} sugestii")
+                except Exception as e:
+                    st.error(f"Błąd generowania sugestii: {e}")
+                
+                # Messages would be lost in the rerun, so they go to the next run
+                st.session_state.bulk_suggestion_result = (len(missing), rejected, failed)
+                st.rerun()
+            
+            if st.session_state.get('bulk_suggestion_result'):
+                total, rejected, failed = st.session_state.pop('bulk_suggestion_result')
+                st.success(f"✅ Wygenerowano {total - rejected - failed}/{total} sugestii")
+                if rejected:
+                    st.info(f"💡 {rejected} produktów nie pasuje do kontekstu swoich akapitów - pominięto je.")
+                if failed:
+                    st.error(f"❌ {failed} sugestii nie udało się wygenerować.")
+            
             # Show recommendations
             for i, rec in enumerate(st.session_state.product_recommendations):
                 # Determine quality of matching
@@ -181,19 +245,22 @@ def show_analyzer_tab(api_keys, produkty_db, products_loaded):
                             
                             with st.spinner("Generuję spójną sugestię..."):
                                 try:
-                                    anthropic_client = anthropic.Anthropic(api_key=api_keys['anthropic'])
+                                    anthropic_client = get_anthropic_client(api_keys['anthropic'])
                                     suggestion = generate_product_suggestion(
                                         rec['paragraph_text'],
                                         rec['product'],
                                         rec.get('suggestion_type', 'general'),
-                                        anthropic_client
+                                        anthropic_client,
+                                        use_cache=use_llm_cache
                                     )
                                     
                                     # Check if suggestion is valid
-                                    if "PRODUKT_NIE_PASUJE_DO_KONTEKSTU" in suggestion or "nie pasuje do kontekstu" in suggestion.lower():
+                                    if is_rejected_suggestion(suggestion):
+                                        rejected_suggestions.add(i)
                                         st.error("❌ Ten produkt nie pasuje do kontekstu tego akapitu.")
                                         st.info("💡 Spróbuj wybrać inny fragment tekstu lub poczekaj na lepsze dopasowania.")
                                     else:
+                                        rejected_suggestions.discard(i)
                                         st.session_state[f"suggestion_{i}"] = suggestion
                                         st.rerun()
                                         
@@ -249,6 +316,7 @@ def show_analyzer_tab(api_keys, produkty_db, products_loaded):
                     # Clear only recommendations, keep the text
                     st.session_state.product_recommendations = []
                     # Clear all suggestions
+                    st.session_state.rejected_suggestions = set()
                     keys_to_remove = [key for key in st.session_state.keys() if key.startswith('suggestion_')]
                     for key in keys_to_remove:
                         del st.session_state[key]
@@ -259,6 +327,7 @@ def show_analyzer_tab(api_keys, produkty_db, products_loaded):
                     st.session_state.product_recommendations = []
                     st.session_state.analyzed_text = ""
                     # Clear all suggestions
+                    st.session_state.rejected_suggestions = set()
                     keys_to_remove = [key for key in st.session_state.keys() if key.startswith('suggestion_')]
                     for key in keys_to_remove:
                         del st.session_state[key]
@@ -287,6 +356,10 @@ def show_analyzer_tab(api_keys, produkty_db, products_loaded):
                 with col4:
                     st.metric("🏆 Wysokiej jakości", high_quality)
 
+def is_rejected_suggestion(suggestion):
+    """Check if Claude answered that the product does not fit the paragraph"""
+    return "PRODUKT_NIE_PASUJE_DO_KONTEKSTU" in suggestion or "nie pasuje do kontekstu" in suggestion.lower()
+
 def create_recommendations_summary(recommendations):
     """Create a summary text of all recommendations"""
     summary = "REKOMENDACJE PRODUKTÓW DR AMBROZIAK\n"
@@ -306,7 +379,7 @@ def create_recommendations_summary(recommendations):
         summary += f"Link: {rec['product']['url']}\n\n"
         
         summary += f"ORYGINALNY FRAGMENT:\n"
-        summary += f'"{rec['paragraph_text']}"\n\n'
+        summary += f'"{rec["paragraph_text"]}"\n\n'
         
         # Add main topics if available
         if 'main_topics' in rec and rec['main_topics']:
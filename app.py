@@ -1,7 +1,9 @@
 import streamlit as st
 from generator import show_generator_tab
 from analyzer import show_analyzer_tab
-from products import load_products_database
+from products import read_products_database
+from cache import get_llm_cache, get_page_cache, get_search_cache
+from ratelimit import get_rate_limiter
 
 # ========================================
 # KONFIGURACJA STRONY
@@ -93,6 +95,12 @@ def load_api_keys():
         st.error(f"Brak klucza API: {e}")
         return None
 
+def load_products_database():
+    """Load the products database and show how it went"""
+    produkty_db, products_loaded, (level, message) = read_products_database()
+    getattr(st, level)(message)
+    return produkty_db, products_loaded
+
 # ========================================
 # MAIN APP
 # ========================================
@@ -125,6 +133,19 @@ def main():
         
         # API status
         st.info("🔑 API Keys: Skonfigurowane")
+        
+        # Cache status
+        search_stats = get_search_cache().stats()
+        st.caption(f"🗄️ Cache wyszukiwań: {search_stats['entries']} zapytań, {search_stats['hits']} trafień / {search_stats['misses']} pudeł")
+        llm_stats = get_llm_cache().stats()
+        st.caption(f"🤖 Cache odpowiedzi AI: {llm_stats['entries']} odpowiedzi, {llm_stats['hits']} trafień / {llm_stats['misses']} pudeł")
+        page_stats = get_page_cache().stats()
+        st.caption(f"🌐 Cache stron: {page_stats['pages']} stron ({page_stats['bytes'] // 1024} KB), {page_stats['hits']} trafień, {page_stats['revalidated']} odświeżonych (304) / {page_stats['misses']} pudeł")
+        
+        # API rate limits
+        for name, label in (("anthropic", "Claude"), ("google", "Google")):
+            limit_stats = get_rate_limiter(name).stats()
+            st.caption(f"🚦 {label}: {limit_stats['calls']} zapytań, {limit_stats['retries']} ponowień, {limit_stats['throttles']} ograniczeń (429/529), tempo {limit_stats['rate'] * 60:.0f}/{limit_stats['max_rate'] * 60:.0f} na min")
     
     # Main tabs
     tab1, tab2 = st.tabs(["📝 Generuj nowy artykuł", "🔍 Analizuj gotowy tekst"])
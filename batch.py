@@ -0,0 +1,254 @@
+"""Batch article generation from a JSONL file of topics
+
+Usage:
+    python batch.py topics.jsonl --output-dir output --concurrency 3 --rate-limit 10
+
+Each input line is {"topic": "...", "target_words": 1200}. Every finished article is
+written to the output directory as <slug>.md plus <slug>.json with its metadata; topics
+whose metadata file already exists are skipped, so an interrupted run can simply be restarted.
+API keys are read from ANTHROPIC_API_KEY, OPENAI_API_KEY, GOOGLE_API_KEY and GOOGLE_CX.
+API request limits default to ratelimit.API_LIMITS - set ANTHROPIC_RPM, GOOGLE_RPM etc. to the
+account's tier, otherwise --concurrency beyond what those limits allow only adds waiting.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cache import make_key
+from pipeline import run_generation
+from products import read_products_database
+
+logger = logging.getLogger("batch")
+
+# ========================================
+# BATCH SETTINGS
+# ========================================
+
+DEFAULT_CONCURRENCY = 3          # Articles generated at the same time
+DEFAULT_RATE_LIMIT = 10          # Max article starts per minute
+DEFAULT_TARGET_WORDS = 1200
+MIN_TARGET_WORDS = 400           # Same range as the slider in the generator tab
+MAX_TARGET_WORDS = 5000
+DEFAULT_OUTPUT_DIR = "output"
+
+class StartLimiter:
+    """Spaces job starts evenly so that at most `per_minute` begin in any minute"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self._next_start = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next start slot is free"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def load_api_keys():
+    """API keys from environment variables, same shape as the Streamlit secrets"""
+    names = {
+        'anthropic': "ANTHROPIC_API_KEY",
+        'openai': "OPENAI_API_KEY",
+        'google_api': "GOOGLE_API_KEY",
+        'google_cx': "GOOGLE_CX"
+    }
+    missing = [env for env in names.values() if not os.environ.get(env)]
+    if missing:
+        raise SystemExit(f"Brak kluczy API w zmiennych środowiskowych: {', '.join(missing)}")
+    return {key: os.environ[env] for key, env in names.items()}
+
+def load_topics(path, default_words=DEFAULT_TARGET_WORDS):
+    """Read topics from a JSONL file, skipping blank lines and duplicates
+
+    Invalid lines become jobs with an 'error', so they fail on their own instead of aborting the batch.
+    """
+    topics = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = parse_topic(json.loads(line), default_words)
+            except json.JSONDecodeError as e:
+                topics.append({'id': f"line-{line_number}", 'topic': line, 'error': f"{path}:{line_number}: niepoprawny JSON ({e})"})
+                continue
+            except ValueError as e:
+                topics.append({'id': f"line-{line_number}", 'topic': line, 'error': f"{path}:{line_number}: {e}"})
+                continue
+
+            job['id'] = job_id(job['topic'], job['target_words'])
+            if job['id'] not in seen:
+                seen.add(job['id'])
+                topics.append(job)
+    return topics
+
+def parse_topic(item, default_words=DEFAULT_TARGET_WORDS):
+    """Validated topic and target_words of one input line"""
+    if not isinstance(item, dict) or not isinstance(item.get('topic'), str) or not item['topic'].strip():
+        raise ValueError("brak pola 'topic'")
+
+    target_words = item.get('target_words', default_words)
+    try:
+        target_words = int(target_words)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"niepoprawne target_words: {target_words!r}")
+    if not MIN_TARGET_WORDS <= target_words <= MAX_TARGET_WORDS:
+        raise ValueError(f"target_words musi być między {MIN_TARGET_WORDS} a {MAX_TARGET_WORDS}, jest {target_words}")
+
+    return {'topic': item['topic'].strip(), 'target_words': target_words}
+
+def job_id(topic, target_words):
+    """Readable, collision-free file name for a topic"""
+    ascii_topic = unicodedata.normalize("NFKD", topic.replace("ł", "l").replace("Ł", "L"))
+    ascii_topic = ascii_topic.encode("ascii", "ignore").decode("ascii").lower()
+    slug = re.sub(r'[^a-z0-9]+', '-', ascii_topic).strip('-')[:60] or "artykul"
+    return f"{slug}-{make_key(topic, target_words)[:8]}"
+
+def is_done(output_dir, job):
+    """Metadata is written last, so its presence means the article is complete"""
+    return os.path.exists(os.path.join(output_dir, f"{job['id']}.json"))
+
+def write_atomic(path, text):
+    """Write through a temporary file so a crash never leaves a half-written output"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def run_job(job, api_keys, produkty_db, products_loaded, output_dir, limiter, options):
+    """Generate one article and save it with its metadata"""
+    limiter.wait()
+    errors = []
+    started = time.time()
+
+    result = run_generation(
+        job['topic'], job['target_words'], api_keys, produkty_db, products_loaded,
+        on_progress=lambda fraction, message: logger.debug("[%s] %s", job['id'], message),
+        on_error=errors.append,
+        **options
+    )
+    elapsed = time.time() - started
+    if errors:
+        # Every reported stage feeds the article (competition only runs with use_competition), so a
+        # failure means a degraded article. Nothing is saved, so the topic is retried on the next run
+        raise RuntimeError("; ".join(errors))
+
+    usage = result['usage']
+    metadata = {
+        'id': job['id'],
+        'topic': job['topic'],
+        'target_words': job['target_words'],
+        'title': result['title'],
+        'words': len(result['article'].split()),
+        'outline': result['outline'],
+        'sources': result['sources'],
+        'seconds': round(elapsed, 1),
+        'input_tokens': sum(u['prompt_tokens'] for u in usage),
+        'output_tokens': sum(u['output_tokens'] for u in usage),
+        'generated_at': time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+    write_atomic(os.path.join(output_dir, f"{job['id']}.md"), result['article'])
+    write_atomic(os.path.join(output_dir, f"{job['id']}.json"), json.dumps(metadata, ensure_ascii=False, indent=2))
+    return metadata
+
+def run_batch(topics, api_keys, produkty_db, products_loaded, output_dir=DEFAULT_OUTPUT_DIR,
+              concurrency=DEFAULT_CONCURRENCY, rate_limit=DEFAULT_RATE_LIMIT, **options):
+    """Generate all pending topics concurrently and return a summary"""
+    os.makedirs(output_dir, exist_ok=True)
+    invalid = [job for job in topics if job.get('error')]
+    for job in invalid:
+        logger.error("❌ %s", job['error'])
+    pending = [job for job in topics if not job.get('error') and not is_done(output_dir, job)]
+    skipped = len(topics) - len(pending) - len(invalid)
+    if skipped:
+        logger.info("Pomijam %d gotowych artykułów", skipped)
+
+    limiter = StartLimiter(rate_limit)
+    completed = []
+    failed = []
+    started = time.time()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(run_job, job, api_keys, produkty_db, products_loaded, output_dir, limiter, options): job
+            for job in pending
+        }
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                metadata = future.result()
+            except Exception as e:
+                logger.error("❌ %s: %s", job['topic'], e)
+                failed.append(job)
+                continue
+            completed.append(metadata)
+            logger.info("✅ [%d/%d] %s (%d słów, %.0fs)", len(completed) + len(failed), len(pending),
+                        job['topic'], metadata['words'], metadata['seconds'])
+
+    elapsed = time.time() - started
+    return {
+        'completed': len(completed),
+        'failed': len(failed) + len(invalid),
+        'skipped': skipped,
+        'seconds': elapsed,
+        'articles_per_hour': len(completed) / elapsed * 3600 if completed and elapsed > 0 else 0.0
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wsadowe generowanie artykułów z pliku JSONL")
+    parser.add_argument("topics", help="plik JSONL z polami topic i target_words")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="liczba artykułów generowanych jednocześnie")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_LIMIT,
+                        help="maksymalna liczba startów artykułów na minutę (0 = bez limitu)")
+    parser.add_argument("--target-words", type=int, default=DEFAULT_TARGET_WORDS,
+                        help="długość artykułu dla tematów bez target_words")
+    parser.add_argument("--competition", action="store_true", help="konspekt na podstawie konkurencji")
+    parser.add_argument("--parallel-sections", action="store_true", help="pisz sekcje równolegle")
+    parser.add_argument("--context-budget", action="store_true", help="skróty wcześniejszych sekcji w kontekście")
+    parser.add_argument("--no-llm-cache", action="store_true", help="nie używaj zapisanych odpowiedzi AI")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s"
+    )
+
+    api_keys = load_api_keys()
+    topics = load_topics(args.topics, args.target_words)
+    produkty_db, products_loaded, (level, message) = read_products_database()
+    if level != 'success':
+        logger.warning(message)
+
+    summary = run_batch(
+        topics, api_keys, produkty_db, products_loaded,
+        output_dir=args.output_dir,
+        concurrency=args.concurrency,
+        rate_limit=args.rate_limit,
+        use_competition=args.competition,
+        parallel_sections=args.parallel_sections,
+        context_budget=args.context_budget,
+        use_llm_cache=not args.no_llm_cache
+    )
+
+    print(f"Gotowe: {summary['completed']}, błędy: {summary['failed']}, pominięte: {summary['skipped']}")
+    print(f"Czas: {summary['seconds'] / 60:.1f} min, przepustowość: {summary['articles_per_hour']:.1f} artykułów/h")
+    return 1 if summary['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+"""Micro-benchmark of the analyzer's downloadable summary (analyzer.py)"""
+import pytest
+from analyzer import create_recommendations_summary
+from products import analyze_text_for_products
+from synthetic import markdown_article, product_catalog
+
+ARTICLE_WORDS = [1000, 5000, 20000, 50000]
+
+@pytest.fixture(scope="module", params=ARTICLE_WORDS, ids=lambda words: f"{words}w")
+def recommendations(request):
+    return analyze_text_for_products(markdown_article(request.param), product_catalog(1000))
+
+def test_create_recommendations_summary(benchmark, recommendations):
+    benchmark(create_recommendations_summary, recommendations)
@@ -0,0 +1,28 @@
+"""Micro-benchmarks of the hybrid editor text conversions (generator.py)"""
+import pytest
+from generator import add_smart_formatting, is_likely_header, markdown_to_plain_text, plain_text_to_markdown
+from synthetic import markdown_article
+
+ARTICLE_WORDS = [1000, 5000, 20000, 50000]
+
+@pytest.fixture(scope="module", params=ARTICLE_WORDS, ids=lambda words: f"{words}w")
+def article(request):
+    return markdown_article(request.param)
+
+@pytest.fixture(scope="module")
+def plain_text(article):
+    return markdown_to_plain_text(article)
+
+def test_markdown_to_plain_text(benchmark, article):
+    benchmark(markdown_to_plain_text, article)
+
+def test_plain_text_to_markdown(benchmark, plain_text):
+    benchmark(plain_text_to_markdown, plain_text)
+
+def test_is_likely_header(benchmark, plain_text):
+    lines = plain_text.split('\n')
+    benchmark(lambda: [is_likely_header(line.strip(), i, lines) for i, line in enumerate(lines)])
+
+def test_add_smart_formatting(benchmark, plain_text):
+    lines = [line.strip() for line in plain_text.split('\n') if line.strip()]
+    benchmark(lambda: [add_smart_formatting(line) for line in lines])
@@ -0,0 +1,135 @@
+"""End-to-end benchmark of run_generation against local fake services
+
+Usage:
+    python benchmarks/bench_pipeline.py --concurrency 1 2 4 8 --articles 8
+
+Starts benchmarks/fake_services.py, points the pipeline at it through GOOGLE_SEARCH_URL and
+ANTHROPIC_BASE_URL, disables the response cache and uses a throwaway cache directory, then
+reports end-to-end latency, a per-stage breakdown and throughput for every concurrency level.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_services import FakeServiceConfig, FakeServices
+
+def configure_environment(base_url):
+    """Must run before the app modules are imported - they read these at import time"""
+    os.environ["GOOGLE_SEARCH_URL"] = f"{base_url}/customsearch/v1"
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ["CONTENT_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-cache-")
+    os.environ["TRACE_LOG_PATH"] = os.path.join(os.environ["CONTENT_CACHE_DIR"], "traces.jsonl")
+
+def run_level(concurrency, articles, api_keys, produkty_db, products_loaded, options, run_number):
+    """Generate `articles` articles with `concurrency` at a time"""
+    from pipeline import run_generation
+
+    def generate(i):
+        # Unique topics so that no cache layer serves a previous run
+        topic = f"pielęgnacja skóry {run_number}-{concurrency}-{i}"
+        started = time.perf_counter()
+        result = run_generation(topic, 1500, api_keys, produkty_db, products_loaded, use_llm_cache=False, **options)
+        return time.perf_counter() - started, result['trace']
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        runs = list(executor.map(generate, range(articles)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [seconds for seconds, _ in runs]
+    stages = {}
+    for _, spans in runs:
+        for span in spans:
+            stages.setdefault(span['stage'], []).append(span['seconds'])
+
+    return {
+        'concurrency': concurrency,
+        'articles': articles,
+        'seconds': round(elapsed, 2),
+        'articles_per_hour': round(articles / elapsed * 3600, 1),
+        'latency_p50': round(float(np.percentile(latencies, 50)), 2),
+        'latency_p95': round(float(np.percentile(latencies, 95)), 2),
+        # Total seconds per article spent in each stage (parallel stages overlap in wall time)
+        'stages': {
+            stage: {'calls': len(values), 'seconds_per_article': round(sum(values) / articles, 2),
+                    'p95': round(float(np.percentile(values, 95)), 3)}
+            for stage, values in sorted(stages.items())
+        }
+    }
+
+def print_report(results):
+    print(f"\n{'równolegle':>10} {'artykuły':>9} {'czas [s]':>9} {'art./h':>8} {'p50 [s]':>8} {'p95 [s]':>8}")
+    for result in results:
+        print(f"{result['concurrency']:>10} {result['articles']:>9} {result['seconds']:>9} "
+              f"{result['articles_per_hour']:>8} {result['latency_p50']:>8} {result['latency_p95']:>8}")
+
+    for result in results:
+        print(f"\nEtapy przy {result['concurrency']} równoległych (sekundy na artykuł, p95 pojedynczego wywołania):")
+        for stage, stats in result['stages'].items():
+            print(f"  {stage:<20} {stats['seconds_per_article']:>8} s  x{stats['calls']:<4} p95 {stats['p95']} s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark całego generowania na lokalnych atrapach usług")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--articles", type=int, default=None, help="artykuły na poziom (domyślnie 2x równoległość)")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="sekundy do pierwszego tokena")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--section-tokens", type=int, default=450)
+    parser.add_argument("--search-latency", type=float, default=0.15)
+    parser.add_argument("--page-latency", type=float, default=0.2)
+    parser.add_argument("--slow-page-every", type=int, default=0, help="co n-ta strona odpowiada wolno")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--parallel-sections", action="store_true")
+    parser.add_argument("--context-budget", action="store_true")
+    parser.add_argument("--json", help="zapisz wyniki do pliku JSON")
+    args = parser.parse_args(argv)
+
+    config = FakeServiceConfig(
+        llm_latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        section_tokens=args.section_tokens,
+        search_latency=args.search_latency,
+        page_latency=args.page_latency,
+        slow_page_every=args.slow_page_every
+    )
+
+    with FakeServices(config) as services:
+        configure_environment(services.base_url)
+        os.chdir(ROOT)
+
+        import ratelimit
+        from products import read_products_database
+        # The fake services never throttle - measure the pipeline, not the client-side pacing
+        for limits in ratelimit.API_LIMITS.values():
+            limits['rate'] = limits['burst'] = 10000
+
+        api_keys = {'anthropic': "fake", 'openai': None, 'google_api': "fake", 'google_cx': "fake"}
+        produkty_db, products_loaded, _ = read_products_database()
+        options = {
+            'stream': args.stream,
+            'parallel_sections': args.parallel_sections,
+            'context_budget': args.context_budget
+        }
+
+        results = []
+        for run_number, concurrency in enumerate(args.concurrency):
+            articles = args.articles or concurrency * 2
+            print(f"▶ {articles} artykułów, {concurrency} równolegle...", flush=True)
+            results.append(run_level(concurrency, articles, api_keys, produkty_db, products_loaded, options, run_number))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Micro-benchmarks of keyword product matching (products.py) over growing catalogs"""
+import pytest
+from products import analyze_text_for_products, find_matching_products, get_product_index, ProductIndex
+from synthetic import markdown_article, product_catalog
+
+CATALOG_SIZES = [50, 1000, 10000, 100000]
+ARTICLE_WORDS = [1000, 10000, 50000]
+
+@pytest.fixture(scope="module", params=CATALOG_SIZES, ids=lambda size: f"{size}p")
+def catalog(request):
+    products = product_catalog(request.param)
+    get_product_index(products)  # Steady state - the app builds the index once per catalog
+    return products
+
+@pytest.fixture(scope="module", params=ARTICLE_WORDS, ids=lambda words: f"{words}w")
+def article(request):
+    return markdown_article(request.param)
+
+def test_build_product_index(benchmark, catalog):
+    benchmark.pedantic(ProductIndex, args=(catalog,), rounds=3, iterations=1)
+
+def test_find_matching_products(benchmark, catalog):
+    benchmark(find_matching_products, "trądzik na dekolcie", "Codzienna pielęgnacja skóry trądzikowej", catalog, None)
+
+def test_analyze_text_for_products(benchmark, catalog, article):
+    benchmark.pedantic(analyze_text_for_products, args=(article, catalog), rounds=3, iterations=1)
@@ -0,0 +1,39 @@
+"""Benchmark of bulk suggestion generation (products.py) against the fake Anthropic endpoint"""
+import os
+import tempfile
+import pytest
+import cache
+from clients import get_anthropic_client
+from fake_services import FakeServiceConfig, FakeServices
+from products import analyze_text_for_products, generate_product_suggestions
+from ratelimit import get_rate_limiter
+from synthetic import markdown_article, product_catalog
+
+WORKERS = [1, 5]
+RECOMMENDATIONS = 10
+
+@pytest.fixture(scope="module")
+def anthropic_client():
+    config = FakeServiceConfig(llm_latency=0.2, tokens_per_second=5000.0)
+    with FakeServices(config) as services:
+        os.environ["ANTHROPIC_BASE_URL"] = services.base_url
+        # The fake endpoint never throttles - measure the concurrency, not the client-side pacing
+        os.environ["ANTHROPIC_RPM"] = os.environ["ANTHROPIC_BURST"] = "10000"
+        # Responses are still written to the LLM cache - keep them out of the app's cache directory
+        cache.CACHE_DIR = tempfile.mkdtemp(prefix="bench-cache-")
+        for shared in (get_anthropic_client, get_rate_limiter, cache.get_llm_cache):
+            shared.clear()
+        yield get_anthropic_client("fake")
+
+@pytest.fixture(scope="module")
+def recommendations():
+    return list(enumerate(analyze_text_for_products(markdown_article(5000), product_catalog(1000))[:RECOMMENDATIONS]))
+
+@pytest.mark.parametrize("workers", WORKERS)
+def test_generate_product_suggestions(benchmark, anthropic_client, recommendations, workers):
+    def generate():
+        return dict(generate_product_suggestions(recommendations, anthropic_client, max_workers=workers, use_cache=False))
+
+    suggestions = benchmark.pedantic(generate, rounds=2, iterations=1)
+    assert sorted(suggestions) == [i for i, _ in recommendations]
+    assert not [text for text in suggestions.values() if text.startswith("Błąd generowania sugestii")]
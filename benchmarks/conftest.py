@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app modules live in the repository root, the synthetic data helpers next to this file
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
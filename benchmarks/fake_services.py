@@ -0,0 +1,253 @@
+"""Local stand-ins for Google Custom Search, source web pages and the Anthropic Messages API
+
+One threaded HTTP server answers all three:
+    GET  /customsearch/v1?q=...&num=...   Custom Search JSON results pointing at /pages/...
+    GET  /pages/<id>                      realistic HTML article with page chrome
+    POST /v1/messages                     Anthropic-compatible response, JSON or SSE stream
+
+Claude latency is modelled as time to first token plus output tokens / tokens_per_second.
+"""
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = (
+    "skóra cera nawilżanie trądzik zaczerwienienie pory sebum bariera hydrolipidowa kosmetyk "
+    "krem serum tonik peeling retinol witamina niacynamid kwas hialuronowy ceramidy filtr "
+    "przebarwienia zmarszczki elastyczność dermatolog pielęgnacja wieczorna poranna regularnie "
+    "delikatnie stosować unikać podrażnienia łagodzić odbudowywać chronić oczyszczać tydzień "
+    "zima lato słońce wiatr stres dieta sen woda produkt skład składnik efekt rezultat"
+).split()
+
+SECTION_TITLES = [
+    "Skąd biorą się problemy ze skórą",
+    "Jak rozpoznać pierwsze objawy",
+    "Codzienna pielęgnacja krok po kroku",
+    "Składniki, których warto szukać",
+    "Najczęstsze błędy w pielęgnacji",
+    "Kiedy udać się do dermatologa"
+]
+
+# Inline assets that real pages carry and the extractor has to skip
+PAGE_STYLE = "body{margin:0} .c{padding:1em} " * 200
+PAGE_SCRIPT = "var analytics = {track: function(e) { return e; }}; " * 300
+
+class FakeServiceConfig:
+    """Latency and size knobs of the fake services"""
+
+    def __init__(self, llm_latency=0.8, tokens_per_second=80.0, section_tokens=450,
+                 search_latency=0.15, page_latency=0.2, page_paragraphs=40, slow_page_every=0,
+                 slow_page_latency=5.0):
+        self.llm_latency = llm_latency                  # Seconds to first token
+        self.tokens_per_second = tokens_per_second
+        self.section_tokens = section_tokens            # Output tokens of one section
+        self.search_latency = search_latency
+        self.page_latency = page_latency
+        self.page_paragraphs = page_paragraphs
+        self.slow_page_every = slow_page_every          # Every n-th page answers slowly (0 = never)
+        self.slow_page_latency = slow_page_latency
+
+def sentence(rng, words=14):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+def paragraph(rng, sentences=4):
+    return " ".join(sentence(rng, rng.randint(8, 18)) for _ in range(sentences))
+
+def render_page(page_id, paragraphs):
+    """Deterministic HTML page: head with scripts and styles, navigation, article, footer"""
+    rng = random.Random(page_id)
+    chrome = "".join(f'<li><a href="/pages/{rng.randint(0, 999)}">{sentence(rng, 3)}</a></li>' for _ in range(30))
+    body = "".join(
+        f"<h2>{sentence(rng, 5)}</h2>" if i % 6 == 0 else f"<p>{paragraph(rng)}</p>"
+        for i in range(paragraphs)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="pl"><head><meta charset="utf-8"><title>{sentence(rng, 6)}</title>
+<style>{PAGE_STYLE}</style>
+<script>{PAGE_SCRIPT}</script>
+</head><body>
+<header><nav><ul>{chrome}</ul></nav></header>
+<main><article><h1>{sentence(rng, 7)}</h1>{body}</article></main>
+<aside><ul>{chrome}</ul></aside>
+<footer><p>{paragraph(rng, 2)}</p></footer>
+</body></html>""".encode("utf-8")
+
+def prompt_text(messages):
+    """Flatten the user content (string or content blocks) into one string"""
+    parts = []
+    for message in messages:
+        content = message['content']
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get('text', '') for block in content)
+    return "\n".join(parts)
+
+def fake_completion(prompt, max_tokens, config):
+    """Plausible response text and its output token count for each pipeline prompt"""
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+    if "stwórz konspekt" in prompt:
+        sections = "\n\n".join(f"## {i}. {title}\nOpis: {sentence(rng)}" for i, title in enumerate(SECTION_TITLES, 1))
+        text = f"# {sentence(rng, 6)}\n\n{paragraph(rng)}\n\n{sections}"
+    elif "Zwróć TYLKO tablicę JSON" in prompt:
+        text = "[]"
+    elif "wyciągnij najważniejsze fakty" in prompt:
+        text = "\n".join(f"- {sentence(rng)}" for _ in range(15))
+    else:
+        words = []
+        while len(words) < config.section_tokens * 0.75:
+            words.extend(paragraph(rng).split())
+            words.append("\n\n")
+        text = " ".join(words).replace(" \n\n ", "\n\n").strip()
+
+    output_tokens = min(max_tokens, max(1, len(text) // 4))
+    return text, output_tokens
+
+class FakeServicesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/customsearch/v1":
+            self.search(parse_qs(url.query))
+        elif url.path.startswith("/pages/"):
+            self.page(url.path.rsplit("/", 1)[-1])
+        else:
+            self.send_body(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/v1/messages":
+            self.send_body(404, b"not found", "text/plain")
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        self.messages(json.loads(self.rfile.read(length)))
+
+    def search(self, query):
+        time.sleep(self.config.search_latency)
+        q = query.get('q', [''])[0]
+        num = int(query.get('num', ['10'])[0])
+        # Every query gets its own pages, so page caches do not hide fetch costs
+        seed = hashlib.sha256(q.encode("utf-8")).hexdigest()[:12]
+        host = f"http://{self.headers.get('Host')}"
+        items = [
+            {
+                'title': f"{q} - źródło {i + 1}",
+                'link': f"{host}/pages/{seed}-{i}",
+                'snippet': f"Krótki opis strony o temacie {q}."
+            }
+            for i in range(num)
+        ]
+        self.send_body(200, json.dumps({'items': items}, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def page(self, page_id):
+        self.server.page_counter.increment()
+        slow = self.config.slow_page_every and self.server.page_counter.value % self.config.slow_page_every == 0
+        time.sleep(self.config.slow_page_latency if slow else self.config.page_latency)
+        self.send_body(200, render_page(page_id, self.config.page_paragraphs), "text/html; charset=utf-8")
+
+    def messages(self, request):
+        prompt = prompt_text(request['messages'])
+        text, output_tokens = fake_completion(prompt, request.get('max_tokens', 1024), self.config)
+        usage = {'input_tokens': len(prompt) // 4, 'output_tokens': output_tokens,
+                 'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0}
+        message = {
+            'id': f"msg_{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:24]}",
+            'type': "message",
+            'role': "assistant",
+            'model': request['model'],
+            'content': [{'type': "text", 'text': text}],
+            'stop_reason': "end_turn",
+            'stop_sequence': None,
+            'usage': usage
+        }
+        time.sleep(self.config.llm_latency)
+
+        if not request.get('stream'):
+            time.sleep(output_tokens / self.config.tokens_per_second)
+            self.send_body(200, json.dumps(message, ensure_ascii=False).encode("utf-8"), "application/json")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        start = dict(message, content=[], stop_reason=None, usage=dict(usage, output_tokens=1))
+        self.event("message_start", {'type': "message_start", 'message': start})
+        self.event("content_block_start", {'type': "content_block_start", 'index': 0,
+                                           'content_block': {'type': "text", 'text': ""}})
+        chunk_chars = 40                                # About 10 tokens per delta
+        delay = (chunk_chars / 4) / self.config.tokens_per_second
+        for i in range(0, len(text), chunk_chars):
+            time.sleep(delay)
+            self.event("content_block_delta", {'type': "content_block_delta", 'index': 0,
+                                               'delta': {'type': "text_delta", 'text': text[i:i + chunk_chars]}})
+        self.event("content_block_stop", {'type': "content_block_stop", 'index': 0})
+        self.event("message_delta", {'type': "message_delta",
+                                     'delta': {'stop_reason': "end_turn", 'stop_sequence': None},
+                                     'usage': {'output_tokens': output_tokens}})
+        self.event("message_stop", {'type': "message_stop"})
+
+    def event(self, name, data):
+        self.wfile.write(f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def increment(self):
+        with self._lock:
+            self.value += 1
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The streaming extractor hangs up once it has enough text - that is expected
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class FakeServices:
+    """Runs the fake server on a background thread; use as a context manager"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.server = FakeServer((host, port), FakeServicesHandler)
+        self.server.config = config or FakeServiceConfig()
+        self.server.page_counter = Counter()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
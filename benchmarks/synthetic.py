@@ -0,0 +1,75 @@
+"""Deterministic synthetic articles and product catalogs for the micro-benchmarks"""
+import os
+import pickle
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VOCABULARY = (
+    "skóra cera nawilżanie trądzik zaczerwienienie pory sebum bariera hydrolipidowa kosmetyk "
+    "krem serum tonik peeling retinol witamina niacynamid kwas hialuronowy ceramidy filtr "
+    "przebarwienia zmarszczki elastyczność dermatolog pielęgnacja wieczorna poranna regularnie "
+    "delikatnie stosować unikać podrażnienia łagodzić odbudowywać chronić oczyszczać tydzień "
+    "zima lato słońce wiatr stres dieta sen woda produkt skład składnik efekt rezultat leczenie "
+    "objawy warto pomocne terapia łojotokowe suchej wrażliwej naczynkowej"
+).split()
+
+HEADINGS = (
+    "Wprowadzenie", "Przyczyny", "Objawy", "Leczenie", "Pielęgnacja", "Profilaktyka",
+    "Podsumowanie", "Wskazówki", "Często zadawane pytania", "Składniki aktywne"
+)
+
+def sentence(rng, words):
+    text = " ".join(rng.choice(VOCABULARY) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+def markdown_article(words, seed=0):
+    """Markdown article of about `words` words, shaped like generator output"""
+    rng = random.Random(seed)
+    blocks = [f"# {sentence(rng, 6)[:-1]}", sentence(rng, 40)]
+    count = 46
+    while count < words:
+        heading = rng.choice(HEADINGS)
+        blocks.append(f"## {heading}")
+        count += 2
+        for _ in range(rng.randint(2, 4)):
+            kind = rng.random()
+            if kind < 0.2:
+                items = [f"- **{rng.choice(VOCABULARY)}** - {sentence(rng, 8)}" for _ in range(rng.randint(3, 5))]
+                blocks.append("\n".join(items))
+                count += 10 * len(items)
+            else:
+                text = " ".join(sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(3, 6)))
+                words_in_block = text.split()
+                position = rng.randrange(len(words_in_block))
+                words_in_block[position] = f"**{words_in_block[position]}**"
+                if kind > 0.8:
+                    words_in_block[-1] = f"[{words_in_block[-1]}](https://drambroziak.com/produkt)"
+                elif kind > 0.6:
+                    words_in_block[0] = f"*{words_in_block[0]}*"
+                blocks.append(" ".join(words_in_block))
+                count += len(words_in_block)
+    return "\n\n".join(blocks)
+
+def load_real_products():
+    """Products from the bundled embeddings file, without their embedding vectors"""
+    with open(os.path.join(ROOT, "dr_ambroziak_embeddings.pkl"), "rb") as f:
+        data = pickle.load(f)
+    return [
+        {key: value for key, value in item.items() if key != 'embedding'}
+        for item in data if isinstance(item, dict) and 'nazwa' in item
+    ]
+
+def product_catalog(size, seed=0):
+    """Catalog of `size` products derived from the real ones, with shuffled descriptions"""
+    rng = random.Random(seed)
+    base = load_real_products()
+    catalog = []
+    for i in range(size):
+        product = dict(base[i % len(base)])
+        product['id'] = i
+        product['nazwa'] = f"{product['nazwa']} {i}"
+        product['url'] = f"https://drambroziak.com/produkt-{i}"
+        product['zastosowanie'] = f"{product['zastosowanie']} {' '.join(rng.sample(VOCABULARY, 4))}"
+        catalog.append(product)
+    return catalog
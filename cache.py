@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from resources import shared_resource
+
+# ========================================
+# CACHE SETTINGS
+# ========================================
+
+CACHE_DIR = os.environ.get("CONTENT_CACHE_DIR", ".cache")
+
+SEARCH_CACHE_TTL = 7 * 24 * 3600       # Google results are reused for a week
+SEARCH_CACHE_MAX_ENTRIES = 5000
+
+LLM_CACHE_TTL = 30 * 24 * 3600         # Claude responses are reused for a month
+LLM_CACHE_MAX_ENTRIES = 5000
+
+PAGE_CACHE_MAX_AGE = 24 * 3600         # Older pages are revalidated with a conditional GET
+PAGE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+class SQLiteCache:
+    """Persistent key-value store with TTL, LRU eviction and hit/miss counters"""
+
+    def __init__(self, path, ttl=None, max_entries=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached value or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            if self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store a JSON-serializable value and evict least recently used entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            if self.max_entries is not None:
+                self._conn.execute("""
+                    DELETE FROM entries WHERE key IN (
+                        SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+            self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters of this process and the current size of the store"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+class PageCache:
+    """Extracted page text per URL, stored once per content hash, evicted by byte budget"""
+
+    def __init__(self, path, max_age=PAGE_CACHE_MAX_AGE, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS contents (
+                content_hash TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+        self._conn.commit()
+
+    def get(self, url):
+        """Return the cached entry (text, etag, last_modified, fresh) or None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT contents.text, pages.etag, pages.last_modified, pages.fetched_at
+                FROM pages JOIN contents ON contents.content_hash = pages.content_hash
+                WHERE pages.url = ?
+            """, (url,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (now, url))
+            self._conn.commit()
+
+            fresh = now - row[3] <= self.max_age
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale += 1
+
+        return {
+            'text': row[0],
+            'etag': row[1],
+            'last_modified': row[2],
+            'fresh': fresh
+        }
+
+    def set(self, url, text, etag=None, last_modified=None):
+        """Store extracted text for a URL and evict down to the byte budget"""
+        now = time.time()
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO contents (content_hash, text, size) VALUES (?, ?, ?)",
+                (content_hash, text, len(text.encode("utf-8")))
+            )
+            self._conn.execute("""
+                INSERT OR REPLACE INTO pages (url, content_hash, etag, last_modified, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (url, content_hash, etag, last_modified, now, now))
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url):
+        """Mark a cached page as fresh again after a 304 Not Modified"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self._conn.commit()
+            self.revalidated += 1
+
+    def _evict(self):
+        """Drop least recently used pages until stored contents fit in max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM contents").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = self._conn.execute("SELECT url FROM pages ORDER BY accessed_at LIMIT 1").fetchone()
+            if oldest is None:
+                self._conn.execute("DELETE FROM contents")
+                break
+            self._conn.execute("DELETE FROM pages WHERE url = ?", oldest)
+            self._conn.execute("""
+                DELETE FROM contents WHERE content_hash NOT IN (SELECT content_hash FROM pages)
+            """)
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM contents").fetchone()[0]
+
+    def stats(self):
+        """Hit/stale/revalidation/miss counters of this process and the stored size"""
+        with self._lock:
+            pages, size = self._conn.execute("""
+                SELECT (SELECT COUNT(*) FROM pages), (SELECT COALESCE(SUM(size), 0) FROM contents)
+            """).fetchone()
+        return {
+            'hits': self.hits,
+            'stale': self.stale,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'pages': pages,
+            'bytes': size
+        }
+
+def make_key(*parts):
+    """Stable hash key for a tuple of JSON-serializable parts"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a search query"""
+    return " ".join(query.lower().split())
+
+@shared_resource
+def get_search_cache():
+    """Google Custom Search cache shared by all sessions"""
+    return SQLiteCache(
+        os.path.join(CACHE_DIR, "search.sqlite3"),
+        ttl=SEARCH_CACHE_TTL,
+        max_entries=SEARCH_CACHE_MAX_ENTRIES
+    )
+
+@shared_resource
+def get_page_cache():
+    """Extracted source pages shared by all sessions"""
+    return PageCache(os.path.join(CACHE_DIR, "pages.sqlite3"))
+
+@shared_resource
+def get_llm_cache():
+    """Claude response cache shared by all sessions"""
+    return SQLiteCache(
+        os.path.join(CACHE_DIR, "llm.sqlite3"),
+        ttl=LLM_CACHE_TTL,
+        max_entries=LLM_CACHE_MAX_ENTRIES
+    )
@@ -0,0 +1,104 @@
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import anthropic
+import requests
+from openai import OpenAI
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from resources import shared_resource
+
+# ========================================
+# HTTP CLIENT SETTINGS
+# ========================================
+
+HTTP_POOL_CONNECTIONS = 20   # Number of hosts with a kept-alive pool
+HTTP_POOL_MAXSIZE = 6        # Connections kept alive per host
+HTTP_MAX_HOST_CONNECTIONS = 6   # Max concurrent requests per host, enforced by host_slot
+HTTP_HOST_SLOT_TIMEOUT = 10.0   # Seconds to wait for a busy host before giving up
+HTTP_MAX_RETRIES = 2
+HTTP_BACKOFF_FACTOR = 0.5    # Waits 0.5s, 1s, 2s... between retries
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+HTTP_MAX_RETRY_AFTER = 2.0   # Longest Retry-After honoured - sources share a 20s fetch deadline
+
+ANTHROPIC_MAX_CONNECTIONS = 20
+ANTHROPIC_MAX_KEEPALIVE = 10
+ANTHROPIC_TIMEOUT = 180.0          # Long sections can take minutes to generate
+ANTHROPIC_CONNECT_TIMEOUT = 10.0
+ANTHROPIC_MAX_RETRIES = 0          # Retries are paced by ratelimit.get_rate_limiter instead
+
+OPENAI_TIMEOUT = 10.0              # Embeddings are optional - keyword matching takes over on failure
+OPENAI_MAX_RETRIES = 0
+
+class CappedRetry(Retry):
+    """urllib3 Retry that waits at most HTTP_MAX_RETRY_AFTER, whatever Retry-After a site sends"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, HTTP_MAX_RETRY_AFTER)
+
+@shared_resource
+def get_http_session(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                     max_retries=HTTP_MAX_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR):
+    """Shared keep-alive HTTP session, reused across reruns and sessions"""
+    retry = CappedRetry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    # No pool_block: requests gives urllib3 no pool timeout, so a blocked worker would wait forever and
+    # outlive the fetch deadline. Beyond pool_maxsize a request opens an extra, unpooled connection instead,
+    # so the per-host cap is host_slot's job
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+@shared_resource
+def get_host_semaphore(host, limit=HTTP_MAX_HOST_CONNECTIONS):
+    """Connection slots of one host, shared by all fetch workers"""
+    return threading.BoundedSemaphore(limit)
+
+@contextmanager
+def host_slot(url, timeout=HTTP_HOST_SLOT_TIMEOUT):
+    """Hold one of the host's connection slots while a request to it runs, TimeoutError if none frees up"""
+    host = urlsplit(url).netloc.lower()
+    semaphore = get_host_semaphore(host)
+    if not semaphore.acquire(timeout=timeout):
+        raise TimeoutError(f"No free connection to {host} within {timeout}s")
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+@shared_resource
+def get_anthropic_client(api_key, max_connections=ANTHROPIC_MAX_CONNECTIONS,
+                         max_keepalive_connections=ANTHROPIC_MAX_KEEPALIVE,
+                         timeout=ANTHROPIC_TIMEOUT, connect_timeout=ANTHROPIC_CONNECT_TIMEOUT,
+                         max_retries=ANTHROPIC_MAX_RETRIES):
+    """One long-lived Anthropic client per API key, shared across reruns and sessions"""
+    # Limits class of the httpx flavour the installed SDK is built on
+    limits = type(anthropic.DEFAULT_CONNECTION_LIMITS)(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections
+    )
+    return anthropic.Anthropic(
+        api_key=api_key,
+        timeout=anthropic.Timeout(timeout, connect=connect_timeout),
+        max_retries=max_retries,
+        http_client=anthropic.DefaultHttpxClient(limits=limits)
+    )
+
+@shared_resource
+def get_openai_client(api_key, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES):
+    """One OpenAI client per API key with a short timeout, shared across reruns and sessions"""
+    return OpenAI(api_key=api_key, timeout=timeout, max_retries=max_retries)
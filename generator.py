@@ -1,10 +1,12 @@
 import streamlit as st
-import anthropic
-import requests
-from bs4 import BeautifulSoup
+import os
 import re
 import time
-from products import find_matching_products
+from jobs import get_job_manager
+from tracing import stage_percentiles, TRACE_LOG_PATH
+
+# Seconds between status checks of a background generation
+JOB_POLL_INTERVAL = 1.0
 
 def show_generator_tab(api_keys, produkty_db, products_loaded):
     """Show the article generator tab"""
@@ -22,6 +24,40 @@ def show_generator_tab(api_keys, produkty_db, products_loaded):
             help="Docelowa liczba słów w artykule"
         )
         
+        use_competition = st.checkbox(
+            "🏁 Uwzględnij konkurencję w konspekcie",
+            value=False,
+            help="Tytuły i opisy artykułów konkurencji zostaną przekazane do tworzenia konspektu"
+        )
+        
+        parallel_sections = st.checkbox(
+            "🧵 Równoległe pisanie sekcji",
+            value=False,
+            help="Wszystkie sekcje powstają jednocześnie na podstawie opisów z konspektu, a na końcu usuwane są powtórzenia"
+        )
+        
+        context_budget = st.checkbox(
+            "🧠 Oszczędny kontekst sekcji",
+            value=False,
+            help="Wcześniejsze sekcje trafiają do kolejnych promptów jako krótkie streszczenia (nagłówek + główne tezy) zamiast pełnego tekstu"
+        )
+        
+        use_llm_cache = st.checkbox(
+            "♻️ Używaj zapisanych odpowiedzi AI",
+            value=True,
+            help="Identyczne zapytania do Claude są obsługiwane z lokalnego cache bez ponownego wywołania API. Wyłącz, aby wymusić nowe odpowiedzi."
+        )
+        
+        live_preview = st.checkbox(
+            "⚡ Podgląd na żywo",
+            value=True,
+            help="Treść sekcji pojawia się na bieżąco podczas generowania"
+        )
+        
+        # Stage timings of the last run and of the logged history
+        with st.expander("⏱️ Czasy etapów"):
+            show_stage_timings(st.session_state.get('generation_trace'))
+        
         st.markdown("---")
         
         # Article history
@@ -51,38 +87,147 @@ def show_generator_tab(api_keys, produkty_db, products_loaded):
             "🚀 Generuj artykuł",
             type="primary",
             use_container_width=True,
-            disabled=not topic.strip()
+            disabled=not topic.strip() or bool(st.session_state.get('generation_job'))
         )
     
-    # Generate article
+    # Generate article - runs in the background so reruns don't interrupt it
     if generate_button and topic.strip():
-        with st.spinner("Generuję artykuł..."):
-            try:
-                article = generate_article(
-                    topic.strip(), 
-                    target_words, 
-                    api_keys, 
-                    produkty_db,
-                    products_loaded
-                )
-                
-                st.session_state.generated_article = article
-                st.session_state.edited_article = article
-                
-                # Add to history
-                timestamp = time.strftime("%H:%M")
-                st.session_state.article_history.append((topic.strip(), timestamp, article))
-                
-                st.rerun()
-                
-            except Exception as e:
-                st.error(f"❌ Błąd generowania artykułu: {e}")
+        st.session_state.generation_job = get_job_manager().submit(
+            topic.strip(), 
+            target_words, 
+            api_keys, 
+            produkty_db,
+            products_loaded,
+            use_competition=use_competition,
+            stream=live_preview,
+            parallel_sections=parallel_sections,
+            context_budget=context_budget,
+            use_llm_cache=use_llm_cache
+        )
+        st.session_state.generation_preview = live_preview
+        st.session_state.generation_notices = []
+    
+    if st.session_state.get('generation_job'):
+        show_generation_job()
+    
+    # Errors of the last finished generation - kept across the rerun that ended its polling
+    for level, message in st.session_state.get('generation_notices', []):
+        getattr(st, level)(message)
+    
+    # Token usage of the last generation
+    if st.session_state.get('generation_usage'):
+        show_usage_summary(st.session_state.generation_usage)
     
     # Show hybrid editor if article exists
     if st.session_state.generated_article:
         st.markdown("---")
         show_hybrid_editor(topic if 'topic' in locals() else "")
 
+def show_generation_job():
+    """Show progress of the background generation and collect the article when it finishes"""
+    job = get_job_manager().get(st.session_state.generation_job)
+    if job is None:
+        finish_generation_job([('warning', "⚠️ Zadanie generowania zostało przerwane (restart serwera). Uruchom je ponownie.")])
+        return
+    
+    for error in job.errors:
+        st.error(error)
+    
+    if job.active:
+        st.progress(job.progress)
+        st.text(job.message)
+        if st.session_state.get('generation_preview') and job.partial_article:
+            st.markdown(job.partial_article)
+        if not hasattr(st, "fragment"):
+            time.sleep(JOB_POLL_INTERVAL)
+            st.rerun()
+        return
+    
+    notices = [('error', error) for error in job.errors]
+    if job.status == "failed":
+        finish_generation_job(notices + [('error', f"❌ Błąd generowania artykułu: {job.error}")])
+        return
+    
+    article = job.result['article']
+    st.session_state.generated_article = article
+    st.session_state.edited_article = article
+    st.session_state.generation_usage = job.result['usage']
+    st.session_state.generation_trace = job.result['trace']
+    
+    # Add to history
+    timestamp = time.strftime("%H:%M", time.localtime(job.finished_at))
+    st.session_state.article_history.append((job.topic, timestamp, article))
+    
+    finish_generation_job(notices)
+
+# Poll the job without rerunning the whole page, on Streamlit versions that support fragments
+if hasattr(st, "fragment"):
+    show_generation_job = st.fragment(run_every=JOB_POLL_INTERVAL)(show_generation_job)
+
+def finish_generation_job(notices):
+    """Stop polling and rerun the whole page - re-enables the generate button outside the fragment"""
+    st.session_state.generation_job = None
+    st.session_state.generation_notices = notices
+    st.rerun()
+
+def show_stage_timings(spans):
+    """Per-stage wall time, tokens and cache hits of the last run, plus p50/p95 from the trace log"""
+    if spans:
+        stages = {}
+        for span in spans:
+            stage = stages.setdefault(span['stage'], {
+                'etap': span['stage'], 'liczba': 0, 'czas (s)': 0.0,
+                'tokeny wej.': 0, 'tokeny wyj.': 0, 'cache': 0, 'KB': 0
+            })
+            stage['liczba'] += 1
+            stage['czas (s)'] = round(stage['czas (s)'] + span['seconds'], 2)
+            stage['tokeny wej.'] += span.get('input_tokens', 0) + span.get('cache_read_tokens', 0) + span.get('cache_write_tokens', 0)
+            stage['tokeny wyj.'] += span.get('output_tokens', 0)
+            stage['cache'] += int(bool(span.get('cache_hit')))
+            stage['KB'] += span.get('bytes', 0) // 1024
+        st.caption("Ostatnie generowanie (etapy równoległe nakładają się w czasie)")
+        st.dataframe(list(stages.values()), use_container_width=True, hide_index=True)
+    
+    history = cached_stage_percentiles(*trace_log_version())
+    if history:
+        st.caption("Historia (p50 / p95 w sekundach)")
+        st.dataframe(history, use_container_width=True, hide_index=True)
+    elif not spans:
+        st.caption("Brak danych - wygeneruj artykuł.")
+
+def trace_log_version(path=TRACE_LOG_PATH):
+    """Path, mtime and size of the trace log - changes whenever spans are written"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path, None, None
+    return path, stat.st_mtime_ns, stat.st_size
+
+@st.cache_data(max_entries=4)
+def cached_stage_percentiles(path, mtime, size):
+    """stage_percentiles, read again only after the log has changed"""
+    return stage_percentiles(path)
+
+def show_usage_summary(usage_log):
+    """Show cached vs uncached input tokens of the section calls"""
+    with st.expander("📊 Tokeny sekcji (prompt caching)"):
+        cached = sum(entry['cache_read_tokens'] for entry in usage_log)
+        uncached = sum(entry['input_tokens'] + entry['cache_write_tokens'] for entry in usage_log)
+        output = sum(entry['output_tokens'] for entry in usage_log)
+        largest_prompt = max(entry['prompt_tokens'] for entry in usage_log)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("♻️ Wejście z cache", cached)
+        with col2:
+            st.metric("📥 Wejście bez cache", uncached)
+        with col3:
+            st.metric("📤 Wyjście", output)
+        with col4:
+            st.metric("📏 Największy prompt", largest_prompt)
+        
+        st.dataframe(usage_log, use_container_width=True)
+
 def show_hybrid_editor(topic):
     """Show the hybrid editor with plain text and markdown preview"""
     
@@ -177,8 +322,13 @@ def show_hybrid_text_editor(article_content):
     
     st.markdown('<div class="editor-header"><h4>📝 Hybrid Editor</h4></div>', unsafe_allow_html=True)
     
+    # Lines converted on earlier reruns are reused - an edit re-converts only the lines it touched
+    if 'plain_text_line_cache' not in st.session_state:
+        st.session_state.plain_text_line_cache = {}
+        st.session_state.markdown_line_cache = {}
+    
     # Convert markdown to plain text for editing
-    plain_text = markdown_to_plain_text(article_content)
+    plain_text = markdown_to_plain_text(article_content, st.session_state.plain_text_line_cache)
     
     # Split view: Text Editor + Markdown Preview
     editor_col, preview_col = st.columns([1, 1])
@@ -198,7 +348,7 @@ def show_hybrid_text_editor(article_content):
     with preview_col:
         st.markdown("**👁️ Podgląd markdown:**")
         # Convert plain text back to markdown
-        markdown_content = plain_text_to_markdown(edited_text)
+        markdown_content = plain_text_to_markdown(edited_text, st.session_state.markdown_line_cache)
         
         # Scrollable preview container
         preview_container = st.container(height=500)
@@ -253,45 +403,165 @@ def show_markdown_editor(article_content):
     # Note about markdown
     st.info("💡 **Tip**: Edytuj kod markdown po lewej stronie - podgląd aktualizuje się automatycznie po prawej!")
 
-def markdown_to_plain_text(markdown_content):
-    """Convert markdown to plain text for hybrid editing"""
+# ========================================
+# TEXT CONVERSION
+# ========================================
+
+# Patterns are compiled once - the hybrid editor converts the whole article on every rerun
+MARKDOWN_HEADER_RE = re.compile(r'#{1,6}\s+')
+MARKDOWN_HEADER_ONLY_RE = re.compile(r'#{1,6}\s*')      # Nothing after the marker - its \s+ would span lines
+MARKDOWN_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+MARKDOWN_ITALIC_RE = re.compile(r'\*(.*?)\*')
+MARKDOWN_LINK_RE = re.compile(r'\[([^\]]+)\]\([^)]+\)')
+MARKDOWN_CODE_RE = re.compile(r'`([^`]+)`')
+EXTRA_BLANK_LINES_RE = re.compile(r'\n\n\n+')
+LIST_MARKERS = ('-', '*', '+')
+
+HEADER_WORDS_RE = re.compile(r'jak|dlaczego|gdzie|kiedy|czym|przyczyny|sposoby|metody')
+IMPORTANT_PHRASES_RE = re.compile(
+    r'\b(?=\w)(ważne|istotne|kluczowe|najważniejsze|pamiętaj|uwaga|'
+    r'pierwsz[aey]|główn[aey]|podstawow[aey]|skuteczn[aey]|najlepsz[aey]|idealn[aey])\b',
+    re.IGNORECASE
+)
+# Every IMPORTANT_PHRASES_RE match starts with one of these in the lowercased text
+IMPORTANT_PHRASE_STEMS = (
+    'ważne', 'istotne', 'kluczowe', 'najważniejsze', 'pamiętaj', 'uwaga',
+    'pierwsz', 'główn', 'podstawow', 'skuteczn', 'najlepsz', 'idealn'
+)
+
+def markdown_to_plain_text(markdown_content, line_cache=None):
+    """Convert markdown to plain text for hybrid editing - one pass over the lines
+    
+    line_cache maps markdown lines to their conversions. Lines converted in an earlier
+    call are reused, and the dict is left holding the lines of this text only.
+    """
+    
+    lines = []
+    blank_lines = []  # Held back: a following list item swallows them, as ^\s* does
+    converted = {}
+    
+    for line in markdown_content.split('\n'):
+        if line_cache is not None and line in line_cache:
+            plain = line_cache[line]
+        else:
+            plain = markdown_line_to_plain(line)
+        if plain is None:
+            return markdown_to_plain_text_multipass(markdown_content)
+        if line_cache is not None:
+            converted[line] = plain
+        
+        text, list_item = plain
+        if list_item:
+            blank_lines = []
+        elif not text.strip():
+            blank_lines.append(text)
+            continue
+        
+        lines.extend(blank_lines)
+        blank_lines = []
+        lines.append(text)
+    
+    if line_cache is not None:
+        line_cache.clear()
+        line_cache.update(converted)
+    
+    lines.extend(blank_lines)
+    return remove_inline_markdown('\n'.join(lines))
+
+def markdown_line_to_plain(line):
+    """Plain text of one markdown line and whether it is a list item
+    
+    None if a header or list marker has nothing after it - its pattern would run
+    into the next line, so only the whole-text passes convert it correctly.
+    """
     
     # Remove markdown headers but keep the text
-    text = re.sub(r'^#{1,6}\s+', '', markdown_content, flags=re.MULTILINE)
+    if line.startswith('#'):
+        if MARKDOWN_HEADER_ONLY_RE.fullmatch(line):
+            return None
+        header = MARKDOWN_HEADER_RE.match(line)
+        if header:
+            line = line[header.end():]
     
     # Remove bold/italic markers
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Bold
-    text = re.sub(r'\*(.*?)\*', r'\1', text)      # Italic
+    if '*' in line:
+        line = strip_paired_marker(strip_paired_marker(line, '**'), '*')
     
     # Convert markdown lists to simple lists
-    text = re.sub(r'^\s*[-*+]\s+', '• ', text, flags=re.MULTILINE)
-    
-    # Remove extra markdown syntax
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)  # Links
-    text = re.sub(r'`([^`]+)`', r'\1', text)              # Code
+    stripped = line.lstrip()
+    if stripped.startswith(LIST_MARKERS) and (len(stripped) == 1 or stripped[1].isspace()):
+        item = stripped[1:].lstrip()
+        if not item:
+            return None
+        return '• ' + item, True
+    
+    return line, False
+
+def markdown_to_plain_text_multipass(markdown_content):
+    """Whole-text version of markdown_to_plain_text, for markers with nothing after them"""
     
-    # Clean up extra whitespace
-    text = re.sub(r'\n\n\n+', '\n\n', text)
+    text = re.sub(r'^#{1,6}\s+', '', markdown_content, flags=re.MULTILINE)
+    text = MARKDOWN_BOLD_RE.sub(r'\1', text)
+    text = MARKDOWN_ITALIC_RE.sub(r'\1', text)
+    text = re.sub(r'^\s*[-*+]\s+', '• ', text, flags=re.MULTILINE)
+    return remove_inline_markdown(text)
+
+def strip_paired_marker(line, marker):
+    """Drop each marker pair and keep the text between, like the bold/italic regex on one line"""
+    
+    parts = []
+    position = 0
+    while True:
+        start = line.find(marker, position)
+        if start < 0:
+            break
+        end = line.find(marker, start + len(marker))
+        if end < 0:
+            break
+        parts.append(line[position:start])
+        parts.append(line[start + len(marker):end])
+        position = end + len(marker)
+    
+    if not parts:
+        return line
+    parts.append(line[position:])
+    return ''.join(parts)
+
+def remove_inline_markdown(text):
+    """Drop link and code syntax (both may span lines) and extra blank lines"""
     
+    text = MARKDOWN_LINK_RE.sub(r'\1', text)
+    text = MARKDOWN_CODE_RE.sub(r'\1', text)
+    text = EXTRA_BLANK_LINES_RE.sub('\n\n', text)
     return text.strip()
 
-def plain_text_to_markdown(plain_text):
-    """Convert plain text back to markdown with intelligent formatting"""
+def plain_text_to_markdown(plain_text, line_cache=None):
+    """Convert plain text back to markdown with intelligent formatting
+    
+    line_cache works as in markdown_to_plain_text. Besides the line itself, its markdown
+    depends only on its position among the first lines and on a blank line before it.
+    """
     
     lines = plain_text.split('\n')
     markdown_lines = []
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+    paragraphs = []  # Positions in markdown_lines of regular paragraphs
+    keys = []
+    
+    for i, raw_line in enumerate(lines):
+        if line_cache is not None:
+            key = (raw_line, min(i, 3), i > 0 and not lines[i-1].strip())
+            keys.append(key)
+            if key in line_cache:
+                markdown_lines.append(line_cache[key])
+                continue
+        
+        line = raw_line.strip()
         
         if not line:
             markdown_lines.append('')
-            i += 1
-            continue
         
         # Detect headers (lines that look like titles)
-        if is_likely_header(line, i, lines):
+        elif is_likely_header(line, i, lines):
             # Determine header level
             if i == 0 or (i < 3 and len(line) > 20):
                 markdown_lines.append(f'# {line}')
@@ -304,11 +574,18 @@ def plain_text_to_markdown(plain_text):
         
         # Regular paragraph
         else:
-            # Add bold to important phrases
-            formatted_line = add_smart_formatting(line)
-            markdown_lines.append(formatted_line)
-        
-        i += 1
+            paragraphs.append(len(markdown_lines))
+            markdown_lines.append(line)
+    
+    # Add bold to important phrases - in one call, a phrase never spans lines
+    if paragraphs:
+        formatted = add_smart_formatting('\n'.join(markdown_lines[i] for i in paragraphs))
+        for i, line in zip(paragraphs, formatted.split('\n')):
+            markdown_lines[i] = line
+    
+    if line_cache is not None:
+        line_cache.clear()
+        line_cache.update(zip(keys, markdown_lines))
     
     return '\n'.join(markdown_lines)
 
@@ -336,335 +613,36 @@ def is_likely_header(line, index, all_lines):
         return True
     
     # Contains header-like words
-    header_words = ['jak', 'dlaczego', 'gdzie', 'kiedy', 'czym', 'przyczyny', 'sposoby', 'metody']
-    if any(word in line.lower() for word in header_words):
-        return True
-    
-    return False
+    return HEADER_WORDS_RE.search(line.lower()) is not None
 
 def add_smart_formatting(text):
     """Add smart formatting like bold to important phrases"""
     
-    # Bold important phrases
-    important_phrases = [
-        r'\b(ważne|istotne|kluczowe|najważniejsze|pamiętaj|uwaga)\b',
-        r'\b(pierwsz[aey]|główn[aey]|podstawow[aey])\b',
-        r'\b(skuteczn[aey]|najlepsz[aey]|idealn[aey])\b'
-    ]
-    
-    for phrase_pattern in important_phrases:
-        text = re.sub(phrase_pattern, r'**\1**', text, flags=re.IGNORECASE)
-    
-    return text
+    # The IGNORECASE regex tries every position - only try it where a stem starts. lower() keeps
+    # positions and agrees with IGNORECASE on everything but İ, ı and ſ
+    lowered = text.lower()
+    if len(lowered) != len(text) or 'ı' in text or 'ſ' in text:
+        return IMPORTANT_PHRASES_RE.sub(r'**\1**', text)
+    
+    starts = sorted({start for stem in IMPORTANT_PHRASE_STEMS for start in find_all(lowered, stem)})
+    parts = []
+    position = 0
+    for start in starts:
+        match = IMPORTANT_PHRASES_RE.match(text, start) if start >= position else None
+        if match:
+            parts.append(text[position:start])
+            parts.append(f'**{match.group(1)}**')
+            position = match.end()
+    
+    if not parts:
+        return text
+    parts.append(text[position:])
+    return ''.join(parts)
 
-# ========================================
-# ARTICLE GENERATION FUNCTIONS
-# ========================================
-
-def generate_article(topic, target_words, api_keys, produkty_db, products_loaded):
-    """Main article generation workflow"""
-    
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    # Step 1: Competition analysis
-    status_text.text("🔍 Analizuję konkurencję...")
-    progress_bar.progress(0.1)
-    
-    competition = search_competition(topic, api_keys['google_api'], api_keys['google_cx'])
+def find_all(text, substring):
+    """Start positions of every occurrence of substring"""
     
-    # Step 2: Information gathering
-    status_text.text("📚 Zbiera informacje...")
-    progress_bar.progress(0.25)
-    
-    search_results = search_information(topic, api_keys['google_api'], api_keys['google_cx'])
-    all_content = ""
-    
-    for i, result in enumerate(search_results):
-        content = extract_page_content(result['url'], result['title'], result['snippet'])
-        all_content += f"\n--- Źródło {i+1}: {result['title']} ---\n{content}\n"
-    
-    # Step 3: Fact analysis
-    status_text.text("🤖 Analizuję fakty przez Claude...")
-    progress_bar.progress(0.4)
-    
-    facts = analyze_facts(all_content, topic, api_keys['anthropic'])
-    
-    # Step 4: Create outline
-    status_text.text("📋 Tworzę konspekt...")
-    progress_bar.progress(0.55)
-    
-    outline = create_outline(topic, facts, target_words, api_keys['anthropic'])
-    
-    # Parse outline
-    title_match = re.search(r'# (.+)', outline)
-    title = title_match.group(1) if title_match else topic
-    
-    intro_match = re.search(r'# .+?\n\n(.+?)\n\n##', outline, re.DOTALL)
-    intro = intro_match.group(1).strip() if intro_match else ""
-    
-    section_titles = re.findall(r'## (?:\d+\.\s*)?(.+)', outline)
-    
-    # Step 5: Write sections
-    sections = []
-    written_content = ""
-    
-    for i, section_title in enumerate(section_titles):
-        status_text.text(f"✍️ Piszę sekcję {i+1}/{len(section_titles)}: {section_title}")
-        progress_bar.progress(0.6 + (0.3 * i / len(section_titles)))
-        
-        remaining_sections = "\n".join([f"## {s}" for s in section_titles[i+1:]])
-        
-        # Find matching products for this section
-        matching_products = []
-        if products_loaded and produkty_db:
-            matching_products = find_matching_products(topic, section_title, produkty_db, api_keys['openai'])
-        
-        section_content = write_section(
-            topic, outline, facts, section_title, written_content, 
-            remaining_sections, target_words, matching_products, api_keys['anthropic']
-        )
-        
-        section_with_title = f"## {section_title}\n\n{section_content}"
-        sections.append(section_with_title)
-        written_content += section_with_title + "\n\n"
-    
-    # Step 6: Finalize article
-    status_text.text("📄 Finalizuję artykuł...")
-    progress_bar.progress(0.95)
-    
-    final_article = f"# {title}\n\n"
-    if intro:
-        final_article += f"{intro}\n\n"
-    final_article += "\n\n".join(sections)
-    
-    # Add Dr Ambroziak promotion if needed
-    if "dr ambroziak" not in final_article.lower() and products_loaded:
-        final_article += f"\n\n---\n\n**Profesjonalna pielęgnacja skóry** to podstawa zdrowia i piękna. Jeśli szukasz skutecznych kosmetyków opartych na najnowszych osiągnięciach dermatologii, sprawdź [ofertę Dr Ambroziak Laboratorium](https://drambroziak.com) - produkty stworzone przez ekspertów z ponad 20-letnim doświadczeniem."
-    
-    progress_bar.progress(1.0)
-    status_text.text("✅ Artykuł gotowy!")
-    
-    return final_article
-
-# Helper functions for article generation
-def search_competition(topic, google_api_key, google_cx):
-    """Search and analyze competition articles"""
-    search_url = "https://www.googleapis.com/customsearch/v1"
-    params = {
-        'key': google_api_key,
-        'cx': google_cx,
-        'q': f'"{topic}" artykuł blog',
-        'num': 8
-    }
-    
-    try:
-        response = requests.get(search_url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        competition = []
-        if 'items' in data:
-            for item in data['items']:
-                competition.append({
-                    'title': item.get('title', ''),
-                    'url': item.get('link', ''),
-                    'snippet': item.get('snippet', '')
-                })
-        
-        return competition
-    except Exception as e:
-        st.error(f"Błąd wyszukiwania konkurencji: {e}")
-        return []
-
-def search_information(topic, google_api_key, google_cx, limit=6):
-    """Search for information about the topic"""
-    search_url = "https://www.googleapis.com/customsearch/v1"
-    params = {
-        'key': google_api_key,
-        'cx': google_cx,
-        'q': topic,
-        'num': limit
-    }
-    
-    try:
-        response = requests.get(search_url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        results = []
-        if 'items' in data:
-            for item in data['items']:
-                results.append({
-                    'title': item.get('title', ''),
-                    'url': item.get('link', ''),
-                    'snippet': item.get('snippet', '')
-                })
-        
-        return results
-    except Exception as e:
-        st.error(f"Błąd wyszukiwania informacji: {e}")
-        return []
-
-def extract_page_content(url, title, snippet):
-    """Extract content from a webpage"""
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
-        
-        content = ""
-        for selector in ['article', 'main', '.content', '.post-content', '.entry-content', 'p']:
-            elements = soup.select(selector)
-            if elements:
-                content = ' '.join([elem.get_text(strip=True) for elem in elements])
-                break
-        
-        if not content:
-            content = soup.get_text(strip=True)
-        
-        content = ' '.join(content.split())[:2500]
-        return f"{snippet}\n\n{content}" if content else snippet
-    except:
-        return f"{snippet}\n\nBrak dostępu do pełnej treści strony."
-
-def analyze_facts(content, topic, anthropic_key):
-    """Analyze facts using Claude"""
-    client = anthropic.Anthropic(api_key=anthropic_key)
-    
-    prompt = f"""
-    Przeanalizuj poniższe treści dotyczące tematu "{topic}" i wyciągnij najważniejsze fakty.
-    
-    Treści:
-    {content}
-    
-    Przedstaw fakty w formie listy punktów. Skup się na:
-    - Kluczowych definicjach i objawach
-    - Przyczynach problemu
-    - Skutecznych metodach leczenia
-    - Praktycznych wskazówkach
-    - Statystykach i danych naukowych
-    
-    Format odpowiedzi: krótkie, konkretne punkty w stylu lifestyle'owym, przyjazne dla czytelnika.
-    """
-    
-    try:
-        response = client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=1500,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.content[0].text
-    except Exception as e:
-        st.error(f"Błąd analizy faktów: {e}")
-        return ""
-
-def create_outline(topic, facts, target_words, anthropic_key):
-    """Create article outline"""
-    client = anthropic.Anthropic(api_key=anthropic_key)
-    
-    prompt = f"""
-    Na podstawie poniższych faktów o temacie "{topic}", stwórz konspekt artykułu lifestyle'owego zoptymalizowanego pod SEO.
-
-    Fakty:
-    {facts}
-
-    WYMAGANIA:
-    1. Tytuł główny (H1) - atrakcyjny, SEO-friendly, zawierający główne słowo kluczowe
-    2. Krótki wstęp (3-5 zdań) - zajawka bez użycia zwrotów typu "w tym artykule", z naturalnym hookiem.
-    3. 5-7 śródtytułów (H2) - zróżnicowanych, zawierających long-tail keywords
-    4. Dla każdego H2 krótki opis treści (1-2 zdania)
-    5. Cel: około {target_words} słów w całym artykule
-    6. Styl: przyjazny, lifestyle'owy, praktyczny, user-friendly. Wciel się w rolę pomocnego przewodnika po temacie.
-    7. Wyeliminuj wszelkie słowa i zwroty, które mogą świadczyć o AI, takie jak: kluczowy, innowacyjny, holistyczny, nowatorski itp. 
-
-    Format markdown:
-    # Główny tytuł H1
-    
-    [Wstęp 3-5 zdań bez "w tym artykule"]
-    
-    ## 1. Pierwszy śródtytuł H2
-    Opis: Co będzie w tej sekcji...
-    
-    ## 2. Drugi śródtytuł H2  
-    Opis: Co będzie w tej sekcji...
-    
-    STRUKTURA POWINNA BYĆ UROZMAICONA - niektóre sekcje mogą zawierać listy punktowane, ale tylko tam, gdzie to zasadne.
-    """
-    
-    try:
-        response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1500,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.content[0].text
-    except Exception as e:
-        st.error(f"Błąd tworzenia konspektu: {e}")
-        return ""
-
-def write_section(topic, outline, facts, section_title, written_sections, remaining_sections, target_words, matching_products, anthropic_key):
-    """Write article section"""
-    client = anthropic.Anthropic(api_key=anthropic_key)
-    
-    products_info = ""
-    if matching_products:
-        products_info = "\n\nDOSTĘPNE PRODUKTY DR AMBROZIAK (rekomenduj subtelnie gdzie pasuje):\n"
-        for product in matching_products:
-            similarity_info = f" (podobieństwo: {product['similarity']:.1%})" if 'similarity' in product else ""
-            products_info += f"- {product['nazwa']}: {product['opis'][:150]}... - {product['zastosowanie']} - {product['url']}{similarity_info}\n"
-    
-    section_target = target_words // len(re.findall(r'## (?:\d+\.\s*)?(.+)', outline)) if outline else 300
-    
-    prompt = f"""
-    Napisz treść sekcji artykułu lifestyle'owego dla sklepu drambroziak.com.
-
-    TEMAT GŁÓWNY: {topic}
-    ŚRÓDTYTUŁ SEKCJI: {section_title}
-    CEL SŁÓW CAŁEGO ARTYKUŁU: {target_words}
-    CEL SŁÓW TEJ SEKCJI: {section_target}
-
-    KONSPEKT CAŁEGO ARTYKUŁU:
-    {outline}
-
-    DOSTĘPNE FAKTY:
-    {facts}
-
-    CO JUŻ ZOSTAŁO NAPISANE:
-    {written_sections if written_sections else "To jest pierwsza sekcja"}
-
-    CO BĘDZIE NAPISANE PÓŹNIEJ:
-    {remaining_sections if remaining_sections else "To jest ostatnia sekcja"}
-    
-    {products_info}
-
-    WYMAGANIA:
-    - Napisz odpowiednią ilość treści (patrz cel słów dla sekcji)
-    - Styl: przyjazny, lifestyle'owy, praktyczny, user-friendly
-    - NIE powtarzaj informacji z już napisanych sekcji
-    - NIE wyprzedzaj treści z przyszłych sekcji
-    - Używaj konkretnych faktów z dostępnych danych
-    - STRUKTURA: akapity + listy punktowane tam gdzie zasadne (dla lepszej czytelności)
-    - Jeśli znajdziesz naturalne miejsce, subtelnie wspomniej o produkcie Dr Ambroziak (bez forsowania!)
-    - Format: markdown (bez nagłówka H2 - zostanie dodany automatycznie)
-    - Używaj pogrubień **tekst** dla kluczowych pojęć
-    - Wyeliminuj wszelkie słowa i zwroty, które mogą świadczyć o AI, takie jak: kluczowy, innowacyjny, holistyczny, nowatorski itp.
-    
-    Zwróć TYLKO treść sekcji, bez dodatkowych komentarzy.
-    """
-    
-    try:
-        response = client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=2500,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.content[0].text
-    except Exception as e:
-        st.error(f"Błąd pisania sekcji: {e}")
-        return ""
+    start = text.find(substring)
+    while start >= 0:
+        yield start
+        start = text.find(substring, start + 1)
@@ -0,0 +1,98 @@
+import streamlit as st
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pipeline import run_generation
+
+# ========================================
+# BACKGROUND JOB SETTINGS
+# ========================================
+
+MAX_BACKGROUND_JOBS = 4          # Generations running at once across all sessions
+FINISHED_JOB_TTL = 6 * 3600      # Finished jobs are forgotten after this many seconds
+
+class GenerationJob:
+    """State of one article generation, updated by the worker and read by page reruns"""
+
+    def __init__(self, topic, target_words):
+        self.id = uuid.uuid4().hex
+        self.topic = topic
+        self.target_words = target_words
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = "⏳ Czekam w kolejce..."
+        self.partial_article = ""
+        self.errors = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def on_progress(self, fraction, message):
+        self.status = "running"
+        self.progress = fraction
+        self.message = message
+
+    def on_error(self, message):
+        self.errors.append(message)
+
+    def on_article_update(self, markdown, complete):
+        self.partial_article = markdown
+
+class JobManager:
+    """Runs generations on a shared thread pool, independent of Streamlit reruns"""
+
+    def __init__(self, max_workers=MAX_BACKGROUND_JOBS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, topic, target_words, api_keys, produkty_db, products_loaded, **options):
+        """Queue a generation and return its job id"""
+        job = GenerationJob(topic, target_words)
+        with self._lock:
+            self._prune()
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, api_keys, produkty_db, products_loaded, options)
+        return job.id
+
+    def get(self, job_id):
+        """Job by id, or None if unknown (e.g. after a server restart)"""
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, api_keys, produkty_db, products_loaded, options):
+        job.status = "running"
+        try:
+            job.result = run_generation(
+                job.topic, job.target_words, api_keys, produkty_db, products_loaded,
+                on_progress=job.on_progress,
+                on_error=job.on_error,
+                on_article_update=job.on_article_update,
+                **options
+            )
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        job.finished_at = time.time()
+
+    def _prune(self):
+        """Drop finished jobs nobody picked up within FINISHED_JOB_TTL"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and now - job.finished_at > FINISHED_JOB_TTL
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+@st.cache_resource
+def get_job_manager():
+    """Job manager shared by all sessions, survives reruns"""
+    return JobManager()
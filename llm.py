@@ -0,0 +1,74 @@
+import hashlib
+import json
+from types import SimpleNamespace
+from cache import get_llm_cache, make_key
+from ratelimit import get_rate_limiter
+
+def create_message(client, model, max_tokens, messages, temperature=None, use_cache=True, cache=None):
+    """client.messages.create memoized by (model, max_tokens, temperature, prompt hash)"""
+    cache = cache if cache is not None else get_llm_cache()
+    key = response_key(model, max_tokens, temperature, messages)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached_response(cached)
+    
+    request = message_request(model, max_tokens, messages, temperature)
+    response = get_rate_limiter("anthropic").call(client.messages.create, **request)
+    
+    cache.set(key, {'text': response.content[0].text, 'usage': usage_dict(response.usage)})
+    return response
+
+def stream_message(client, model, max_tokens, messages, temperature=None, use_cache=True, cache=None, on_complete=None):
+    """Yield response text chunks; a cached response arrives as one chunk"""
+    cache = cache if cache is not None else get_llm_cache()
+    key = response_key(model, max_tokens, temperature, messages)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached['text']
+            if on_complete:
+                on_complete(cached_response(cached))
+            return
+    
+    request = message_request(model, max_tokens, messages, temperature)
+    # Only opening the stream is retried - a failure after the first chunk is raised
+    stream = get_rate_limiter("anthropic").call(lambda: client.messages.stream(**request).__enter__())
+    with stream:
+        for text in stream.text_stream:
+            yield text
+        response = stream.get_final_message()
+    
+    cache.set(key, {'text': response.content[0].text, 'usage': usage_dict(response.usage)})
+    if on_complete:
+        on_complete(response)
+
+def message_request(model, max_tokens, messages, temperature=None):
+    """Keyword arguments of messages.create / messages.stream"""
+    request = {'model': model, 'max_tokens': max_tokens, 'messages': messages}
+    if temperature is not None:
+        # Not a typed parameter of the 1.x SDK any more, but still accepted by the API for these models
+        request['extra_body'] = {'temperature': temperature}
+    return request
+
+def response_key(model, max_tokens, temperature, messages):
+    """Cache key of a request - the prompt itself is only stored as a hash"""
+    prompt = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return make_key("anthropic", model, max_tokens, temperature, prompt_hash)
+
+def usage_dict(usage):
+    """Token counts of a response as a plain dict"""
+    return {
+        'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+        'output_tokens': getattr(usage, 'output_tokens', 0) or 0
+    }
+
+def cached_response(cached):
+    """Response-like object for a cache hit - no tokens were spent on it"""
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=cached['text'])],
+        usage=SimpleNamespace(input_tokens=0, output_tokens=0,
+                              cache_creation_input_tokens=0, cache_read_input_tokens=0),
+        from_cache=True
+    )
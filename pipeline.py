@@ -0,0 +1,875 @@
+"""Article generation pipeline without any Streamlit UI calls
+
+The Streamlit tab in generator.py is one consumer of run_generation; scripts and
+worker processes can call it directly and receive progress through callbacks.
+"""
+import codecs
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+from lxml import etree
+from products import find_matching_products_batch
+from clients import get_anthropic_client, get_http_session, host_slot
+from cache import get_page_cache, get_search_cache, make_key, normalize_query
+from llm import create_message, stream_message
+from ratelimit import get_rate_limiter
+from tracing import Trace, trace_span
+
+logger = logging.getLogger(__name__)
+
+# Custom Search endpoint - overridable to point the pipeline at a local stand-in
+GOOGLE_SEARCH_URL = os.environ.get("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
+
+# Overall time budget (seconds) for downloading all sources of one article
+SOURCE_FETCH_DEADLINE = 20
+MAX_FETCH_WORKERS = 6
+
+# Fast page extraction limits
+MAX_PAGE_BYTES = 1024 * 1024          # Never download more than this per source
+MAX_CONTENT_CHARS = 2500              # Source text kept for fact analysis
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+SKIPPED_EXTENSIONS = ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.zip',
+                      '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.mp3', '.mp4')
+SKIPPED_TAGS = {'script', 'style', 'nav', 'footer', 'header', 'noscript', 'template'}
+TEXT_BLOCK_TAGS = {'p', 'li', 'h1', 'h2', 'h3', 'h4', 'blockquote', 'dd', 'td'}
+MAIN_CONTENT_TAGS = {'article', 'main'}
+
+# Parallel section writing
+MAX_PARALLEL_SECTIONS = 4
+CONSISTENCY_MODEL = "claude-3-5-haiku-20241022"   # Cheap model for the repetition pass
+
+# Context budget mode - earlier sections are sent as digests instead of full text
+SECTION_DIGEST_CHARS = 600     # Max length of one section digest
+FULL_TEXT_SECTIONS = 1         # Most recent sections still sent in full, for smooth transitions
+
+# ========================================
+# PIPELINE
+# ========================================
+
+def run_generation(topic, target_words, api_keys, produkty_db, products_loaded,
+                   on_progress=None, on_error=None, on_article_update=None,
+                   fetch_deadline=SOURCE_FETCH_DEADLINE, use_competition=False, stream=False,
+                   parallel_sections=False, max_parallel_sections=MAX_PARALLEL_SECTIONS,
+                   context_budget=False, use_llm_cache=True, trace=None):
+    """Run search -> fetch -> facts -> outline -> sections and return the article with its metadata
+
+    Progress is reported as on_progress(fraction, message), errors as on_error(message)
+    (possibly from worker threads) and the partially assembled article as
+    on_article_update(markdown, complete) - complete is False for mid-section stream chunks.
+    Stage timings go to trace (a new one by default) and are appended to the trace log.
+    """
+    
+    client = get_anthropic_client(api_keys['anthropic'])
+    trace = trace if trace is not None else Trace(topic=topic, target_words=target_words)
+    
+    # Step 1: Competition analysis and information search - independent queries, run together
+    report_progress(on_progress, 0.1, "🔍 Analizuję konkurencję i wyszukuję informacje...")
+    
+    search_executor = ThreadPoolExecutor(max_workers=2)
+    # Competition results only feed the outline - without use_competition the CSE query is not paid for
+    competition_future = None
+    if use_competition:
+        competition_future = search_executor.submit(
+            search_competition, topic, api_keys['google_api'], api_keys['google_cx'], on_error=on_error, trace=trace
+        )
+    information_future = search_executor.submit(
+        search_information, topic, api_keys['google_api'], api_keys['google_cx'], on_error=on_error, trace=trace
+    )
+    search_executor.shutdown(wait=False)
+    
+    # Step 2: Information gathering - starts as soon as information results arrive
+    search_results = information_future.result()
+    report_progress(on_progress, 0.25, "📚 Zbiera informacje...")
+    
+    all_content = ""
+    
+    page_contents = fetch_sources(search_results, fetch_deadline, trace=trace)
+    for i, (result, content) in enumerate(zip(search_results, page_contents)):
+        all_content += f"\n--- Źródło {i+1}: {result['title']} ---\n{content}\n"
+    
+    competition = competition_future.result() if competition_future else None
+    
+    # Step 3: Fact analysis
+    report_progress(on_progress, 0.4, "🤖 Analizuję fakty przez Claude...")
+    
+    facts = analyze_facts(all_content, topic, client, use_cache=use_llm_cache, on_error=on_error, trace=trace)
+    
+    # Step 4: Create outline
+    report_progress(on_progress, 0.55, "📋 Tworzę konspekt...")
+    
+    outline = create_outline(
+        topic, facts, target_words, client,
+        competition=competition,
+        use_cache=use_llm_cache,
+        on_error=on_error,
+        trace=trace
+    )
+    
+    # Parse outline
+    title_match = re.search(r'# (.+)', outline)
+    title = title_match.group(1) if title_match else topic
+    
+    intro_match = re.search(r'# .+?\n\n(.+?)\n\n##', outline, re.DOTALL)
+    intro = intro_match.group(1).strip() if intro_match else ""
+    
+    section_titles = re.findall(r'## (?:\d+\.\s*)?(.+)', outline)
+    
+    # Products for all sections at once - one embedding request instead of one per section
+    section_products = find_section_products(topic, section_titles, api_keys, produkty_db, products_loaded, trace=trace)
+    
+    # Step 5: Write sections
+    sections = []
+    written_content = ""
+    section_digests = []
+    usage_log = []
+    
+    if parallel_sections and section_titles:
+        # Outline descriptions are the non-overlap contract instead of the already written text
+        descriptions = parse_section_descriptions(outline)
+        section_executor = ThreadPoolExecutor(max_workers=max_parallel_sections)
+        futures = {}
+        for i, section_title in enumerate(section_titles):
+            other_sections = "\n".join([
+                f"## {other_title}: {description}" if description else f"## {other_title}"
+                for j, (other_title, description) in enumerate(zip(section_titles, descriptions)) if j != i
+            ])
+            future = section_executor.submit(
+                write_planned_section,
+                topic, outline, facts, section_title, descriptions[i], other_sections,
+                target_words, section_products[i], client, usage_log, use_llm_cache, on_error, trace
+            )
+            futures[future] = i
+        
+        section_contents = [""] * len(section_titles)
+        report_progress(on_progress, 0.6, f"✍️ Piszę {len(section_titles)} sekcji równolegle...")
+        for done, future in enumerate(as_completed(futures), 1):
+            section_contents[futures[future]] = future.result()
+            report_progress(on_progress, 0.6 + (0.3 * done / len(section_titles)), f"✍️ Napisano {done}/{len(section_titles)} sekcji")
+        section_executor.shutdown()
+        
+        report_progress(on_progress, 0.9, "🧹 Usuwam powtórzenia między sekcjami...")
+        section_contents = remove_repetitions(section_titles, section_contents, client, use_cache=use_llm_cache, on_error=on_error, trace=trace)
+        sections = [
+            f"## {section_title}\n\n{section_content}"
+            for section_title, section_content in zip(section_titles, section_contents)
+        ]
+        
+        if on_article_update:
+            on_article_update(assemble_article(title, intro, sections), True)
+    else:
+        for i, section_title in enumerate(section_titles):
+            report_progress(on_progress, 0.6 + (0.3 * i / len(section_titles)), f"✍️ Piszę sekcję {i+1}/{len(section_titles)}: {section_title}")
+            
+            remaining_sections = "\n".join([f"## {s}" for s in section_titles[i+1:]])
+            
+            if context_budget:
+                # Digests of older sections + full text of the most recent ones - roughly constant size
+                older = section_digests[:max(0, i - FULL_TEXT_SECTIONS)]
+                recent = sections[max(0, i - FULL_TEXT_SECTIONS):]
+                written_content = "\n\n".join(older + recent)
+            
+            matching_products = section_products[i]
+            
+            if stream:
+                # Hand out the section as it is produced instead of waiting for the whole response
+                section_content = ""
+                for chunk in write_section_stream(
+                    topic, outline, facts, section_title, written_content,
+                    remaining_sections, target_words, matching_products, client, usage_log,
+                    use_cache=use_llm_cache, on_error=on_error, trace=trace
+                ):
+                    section_content += chunk
+                    if on_article_update:
+                        on_article_update(assemble_article(title, intro, sections + [f"## {section_title}\n\n{section_content}"]), False)
+            else:
+                section_content = write_section(
+                    topic, outline, facts, section_title, written_content, 
+                    remaining_sections, target_words, matching_products, client,
+                    usage_log=usage_log, use_cache=use_llm_cache, on_error=on_error, trace=trace
+                )
+            
+            section_with_title = f"## {section_title}\n\n{section_content}"
+            sections.append(section_with_title)
+            if context_budget:
+                section_digests.append(digest_section(section_title, section_content))
+            else:
+                written_content += section_with_title + "\n\n"
+            
+            if on_article_update:
+                on_article_update(assemble_article(title, intro, sections), True)
+    
+    # Step 6: Finalize article
+    report_progress(on_progress, 0.95, "📄 Finalizuję artykuł...")
+    
+    final_article = assemble_article(title, intro, sections)
+    
+    # Add Dr Ambroziak promotion if needed
+    if "dr ambroziak" not in final_article.lower() and products_loaded:
+        final_article += f"\n\n---\n\n**Profesjonalna pielęgnacja skóry** to podstawa zdrowia i piękna. Jeśli szukasz skutecznych kosmetyków opartych na najnowszych osiągnięciach dermatologii, sprawdź [ofertę Dr Ambroziak Laboratorium](https://drambroziak.com) - produkty stworzone przez ekspertów z ponad 20-letnim doświadczeniem."
+    
+    report_progress(on_progress, 1.0, "✅ Artykuł gotowy!")
+    trace.write()
+    
+    return {
+        'topic': topic,
+        'title': title,
+        'article': final_article,
+        'outline': outline,
+        'facts': facts,
+        'sources': search_results,
+        'usage': usage_log,
+        'trace': trace.to_list()
+    }
+
+def generate_article(topic, target_words, api_keys, produkty_db, products_loaded, **options):
+    """Article markdown only - the return contract of the former Streamlit generate_article
+
+    Options are passed on to run_generation (progress callbacks, stream, parallel_sections, ...).
+    """
+    return run_generation(topic, target_words, api_keys, produkty_db, products_loaded, **options)['article']
+
+def report_progress(on_progress, fraction, message):
+    """Pass a progress update to the caller's handler, or log it"""
+    if on_progress:
+        on_progress(fraction, message)
+    else:
+        logger.info(message)
+
+def report_error(on_error, message):
+    """Pass an error message to the caller's handler, or log it"""
+    if on_error:
+        on_error(message)
+    else:
+        logger.error(message)
+
+# Helper functions for article generation
+def assemble_article(title, intro, sections):
+    """Join title, intro and written sections into the article markdown"""
+    article = f"# {title}\n\n"
+    if intro:
+        article += f"{intro}\n\n"
+    article += "\n\n".join(sections)
+    return article
+
+def find_section_products(topic, section_titles, api_keys, produkty_db, products_loaded, trace=None):
+    """Products to recommend in each section, aligned with section_titles"""
+    if products_loaded and produkty_db and section_titles:
+        with trace_span(trace, "find_products", sections=len(section_titles)) as span:
+            products = find_matching_products_batch(
+                [f"{topic} {section_title}".strip() for section_title in section_titles],
+                produkty_db, api_keys['openai']
+            )
+            span.set(products=sum(len(matches) for matches in products))
+            return products
+    return [[] for _ in section_titles]
+
+def parse_section_descriptions(outline):
+    """Per-section descriptions from the outline, aligned with the parsed H2 titles"""
+    matches = list(re.finditer(r'## (?:\d+\.\s*)?(.+)', outline))
+    descriptions = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(outline)
+        block = outline[match.end():end].rstrip('#')
+        description = ' '.join(line.strip() for line in block.splitlines() if line.strip())
+        descriptions.append(re.sub(r'^Opis:\s*', '', description))
+    return descriptions
+
+def digest_section(section_title, section_content, max_chars=SECTION_DIGEST_CHARS):
+    """Compact digest of a written section: heading, bold terms and the opening claim of each block"""
+    key_terms = []
+    for term in re.findall(r'\*\*(.+?)\*\*', section_content):
+        if term not in key_terms:
+            key_terms.append(term)
+    
+    claims = []
+    for block in section_content.split('\n\n'):
+        block = re.sub(r'^\s*(?:[-*•]|\d+\.)\s+', '', block.strip()).replace('**', '')
+        if block:
+            first_sentence = re.split(r'(?<=[.!?])\s', block, maxsplit=1)[0]
+            claims.append(f"- {first_sentence}")
+    
+    digest = f"## {section_title} (streszczenie)"
+    if key_terms:
+        digest += f"\nPojęcia: {', '.join(key_terms[:10])}"
+    for claim in claims:
+        if len(digest) + len(claim) + 1 > max_chars:
+            break
+        digest += f"\n{claim}"
+    return digest
+
+def write_planned_section(topic, outline, facts, section_title, section_description, other_sections, target_words, matching_products, client, usage_log=None, use_cache=True, on_error=None, trace=None):
+    """Write one section without the text of the others - used by the parallel mode"""
+    return write_section(
+        topic, outline, facts, section_title, "", "", target_words, matching_products, client,
+        section_description=section_description, other_sections=other_sections,
+        usage_log=usage_log, use_cache=use_cache, on_error=on_error, trace=trace
+    )
+
+def remove_repetitions(section_titles, section_contents, client, use_cache=True, on_error=None, trace=None):
+    """Cheap consistency pass: drop sentences that repeat earlier sections"""
+    numbered = "\n\n".join([
+        f"=== SEKCJA {i+1}: {section_title} ===\n{section_content}"
+        for i, (section_title, section_content) in enumerate(zip(section_titles, section_contents))
+    ])
+    
+    prompt = f"""
+    Poniżej są sekcje artykułu napisane niezależnie od siebie. Znajdź zdania, które powtarzają informacje podane już we WCZEŚNIEJSZEJ sekcji.
+
+    {numbered}
+
+    Zwróć TYLKO tablicę JSON (bez komentarzy) z powtórzonymi zdaniami z PÓŹNIEJSZYCH sekcji, skopiowanymi dosłownie:
+    [{{"sekcja": 3, "zdanie": "Dokładna treść zdania."}}]
+
+    Jeśli nie ma powtórzeń, zwróć [].
+    """
+    
+    try:
+        with trace_span(trace, "remove_repetitions") as span:
+            response = create_message(
+                client,
+                model=CONSISTENCY_MODEL,
+                max_tokens=1000,
+                temperature=0,
+                messages=[{"role": "user", "content": prompt}],
+                use_cache=use_cache
+            )
+            span.add_usage(response)
+        text = response.content[0].text
+        repetitions = json.loads(text[text.index('['):text.rindex(']') + 1])
+    except Exception as e:
+        report_error(on_error, f"Błąd usuwania powtórzeń: {e}")
+        return section_contents
+    
+    cleaned = list(section_contents)
+    for repetition in repetitions:
+        try:
+            index = int(repetition['sekcja']) - 1
+            sentence = repetition['zdanie'].strip()
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        # Never touch the first section - the repeated information stays where it appeared first
+        if 0 < index < len(cleaned) and sentence and sentence in cleaned[index]:
+            cleaned[index] = remove_sentence(cleaned[index], sentence)
+    return cleaned
+
+def remove_sentence(text, sentence):
+    """Remove a sentence and tidy the whitespace and empty list item it leaves behind
+
+    Only the line(s) the sentence was on are touched - e.g. markdown hard line breaks elsewhere stay.
+    """
+    start = text.find(sentence)
+    if start < 0:
+        return text
+    end = start + len(sentence)
+    line_start = text.rfind("\n", 0, start) + 1
+    line_end = text.find("\n", end)
+    if line_end < 0:
+        line_end = len(text)
+    
+    prefix = text[line_start:start]
+    suffix = text[end:line_end]
+    # A sentence quoted without its emphasis leaves an empty **...** / *...* pair behind
+    for marker in ('**', '*'):
+        if prefix.endswith(marker) and suffix.startswith(marker):
+            prefix = prefix[:-len(marker)]
+            suffix = suffix[len(marker):]
+    if prefix.strip() and suffix.strip():
+        line = prefix.rstrip(' ') + ' ' + suffix.lstrip(' ')
+    elif prefix.strip():
+        line = prefix.rstrip(' ') + suffix
+    else:
+        line = prefix + suffix.lstrip(' ')
+    
+    before = text[:line_start]
+    after = text[line_end:]
+    if not re.fullmatch(r'\s*(?:[-*•]\s*)?', line):
+        return before + line + after
+    
+    # Nothing left on the line - drop it and keep at most one blank line where it was
+    head = before.rstrip("\n")
+    tail = after.lstrip("\n")
+    newlines = (len(before) - len(head)) + (len(after) - len(tail)) - 1
+    if not head or not tail:
+        return head + tail
+    return head + "\n" * min(2, max(1, newlines)) + tail
+
+def search_competition(topic, google_api_key, google_cx, on_error=None, trace=None):
+    """Search and analyze competition articles"""
+    try:
+        with trace_span(trace, "search_competition") as span:
+            return google_search(f'"{topic}" artykuł blog', google_api_key, google_cx, 8, span=span)
+    except Exception as e:
+        report_error(on_error, f"Błąd wyszukiwania konkurencji: {e}")
+        return []
+
+def search_information(topic, google_api_key, google_cx, limit=6, on_error=None, trace=None):
+    """Search for information about the topic"""
+    try:
+        with trace_span(trace, "search_information") as span:
+            return google_search(topic, google_api_key, google_cx, limit, span=span)
+    except Exception as e:
+        report_error(on_error, f"Błąd wyszukiwania informacji: {e}")
+        return []
+
+def google_search(query, google_api_key, google_cx, num, use_cache=True, span=None):
+    """Query Google Custom Search, served from the persistent cache when possible"""
+    cache = get_search_cache()
+    cache_key = make_key("google_cse", normalize_query(query), num, google_cx)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if span is not None:
+                span.set(cache_hit=True, results=len(cached))
+            return cached
+    
+    search_url = GOOGLE_SEARCH_URL
+    params = {
+        'key': google_api_key,
+        'cx': google_cx,
+        'q': query,
+        'num': num
+    }
+    
+    def fetch():
+        # Session without its own retries - the limiter paces and retries CSE requests
+        response = get_http_session(max_retries=0).get(search_url, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    
+    data = get_rate_limiter("google").call(fetch)
+    
+    results = []
+    if 'items' in data:
+        for item in data['items']:
+            results.append({
+                'title': item.get('title', ''),
+                'url': item.get('link', ''),
+                'snippet': item.get('snippet', '')
+            })
+    
+    cache.set(cache_key, results)
+    if span is not None:
+        span.set(cache_hit=False, results=len(results))
+    return results
+
+def fetch_sources(search_results, deadline=SOURCE_FETCH_DEADLINE, trace=None):
+    """Download all sources concurrently, in original order, snippets after the deadline"""
+    if not search_results:
+        return []
+    
+    executor = ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(search_results)))
+    futures = [
+        executor.submit(extract_page_content, result['url'], result['title'], result['snippet'], trace=trace)
+        for result in search_results
+    ]
+    with trace_span(trace, "fetch_sources", pages=len(futures)) as span:
+        not_done = wait(futures, timeout=deadline).not_done
+        span.set(timed_out=len(not_done))
+    # Do not wait for slow hosts - their workers finish on their own request timeout
+    executor.shutdown(wait=False, cancel_futures=True)
+    
+    contents = []
+    for result, future in zip(search_results, futures):
+        if future.done() and not future.cancelled():
+            contents.append(future.result())
+        else:
+            contents.append(snippet_fallback(result['snippet']))
+    return contents
+
+def snippet_fallback(snippet):
+    """Source text used when the page itself is not available"""
+    return f"{snippet}\n\nBrak dostępu do pełnej treści strony."
+
+def extract_page_content(url, title, snippet, fast=True, trace=None):
+    """Extract content from a webpage"""
+    cached = None
+    try:
+        with trace_span(trace, "fetch_page", url=url, cache_hit=False) as span:
+            page_cache = get_page_cache()
+            cached = page_cache.get(url)
+            if cached and cached['fresh']:
+                span.set(cache_hit=True)
+                return format_source(snippet, cached['text'])
+            
+            # Documents and media are never parsed - do not download them at all
+            if url.lower().split('?')[0].endswith(SKIPPED_EXTENSIONS):
+                span.set(skipped=True)
+                return snippet_fallback(snippet)
+            
+            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+            if cached:
+                # Revalidate a stale entry - a 304 costs no body download and no parsing
+                if cached['etag']:
+                    headers['If-None-Match'] = cached['etag']
+                if cached['last_modified']:
+                    headers['If-Modified-Since'] = cached['last_modified']
+            
+            # The session opens extra connections beyond its pool - the slot caps requests per host
+            with host_slot(url):
+                response = get_http_session().get(url, headers=headers, timeout=10, stream=fast)
+                with response:
+                    if response.status_code == 304 and cached:
+                        page_cache.touch(url)
+                        span.set(cache_hit=True, revalidated=True)
+                        return format_source(snippet, cached['text'])
+                    response.raise_for_status()
+                    
+                    content_type = response.headers.get('Content-Type', '').lower()
+                    if fast and content_type and not content_type.startswith(HTML_CONTENT_TYPES):
+                        span.set(skipped=True)
+                        return snippet_fallback(snippet)
+                    
+                    if fast:
+                        content = extract_text_streaming(response, span)
+                    else:
+                        parse_start = time.perf_counter()
+                        content = extract_text_full(response.content)
+                        span.set(bytes=len(response.content), parse_seconds=round(time.perf_counter() - parse_start, 4))
+            
+            # An empty extraction is not cached, so the next run gets another try
+            if content:
+                page_cache.set(url, content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return format_source(snippet, content)
+    except:
+        # A stale copy beats the snippet when revalidation times out or the server errors
+        if cached:
+            return format_source(snippet, cached['text'])
+        return snippet_fallback(snippet)
+
+def extract_text_full(html):
+    """Parse the whole document and pick the best content container"""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    for script in soup(["script", "style", "nav", "footer", "header"]):
+        script.decompose()
+    
+    content = ""
+    for selector in ['article', 'main', '.content', '.post-content', '.entry-content', 'p']:
+        elements = soup.select(selector)
+        if elements:
+            content = ' '.join([elem.get_text(strip=True) for elem in elements])
+            break
+    
+    if not content:
+        content = soup.get_text(strip=True)
+    
+    return ' '.join(content.split())[:MAX_CONTENT_CHARS]
+
+def extract_text_streaming(response, span=None):
+    """Parse the response with lxml while it downloads and stop once enough text is collected"""
+    encoding = None
+    content_type = response.headers.get('Content-Type', '')
+    if 'charset=' in content_type.lower():
+        encoding = content_type.lower().split('charset=')[-1].split(';')[0].strip().strip('"') or None
+    parser = None
+    
+    chunks = []
+    parts = []
+    collected = 0
+    skip_depth = 0
+    block_depth = 0
+    main_depth = 0
+    main_seen = False
+    downloaded = 0
+    parse_seconds = 0.0
+    
+    for chunk in response.iter_content(chunk_size=16384):
+        downloaded += len(chunk)
+        chunks.append(chunk)
+        parse_start = time.perf_counter()
+        if parser is None:
+            # Without a declared charset libxml2 assumes Latin-1 and garbles UTF-8 pages
+            parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding or sniff_encoding(chunk),
+                                          remove_comments=True)
+        parser.feed(chunk)
+        
+        for event, element in parser.read_events():
+            tag = element.tag if isinstance(element.tag, str) else ''
+            
+            if event == 'start':
+                if tag in SKIPPED_TAGS:
+                    skip_depth += 1
+                elif tag in MAIN_CONTENT_TAGS:
+                    if not main_seen:
+                        # Text gathered before the article is page chrome - keep the article only
+                        parts, collected, main_seen = [], 0, True
+                    main_depth += 1
+                elif tag in TEXT_BLOCK_TAGS:
+                    block_depth += 1
+                continue
+            
+            if tag in SKIPPED_TAGS:
+                skip_depth -= 1
+                element.clear(keep_tail=True)
+            elif tag in MAIN_CONTENT_TAGS:
+                main_depth -= 1
+            elif tag in TEXT_BLOCK_TAGS:
+                block_depth -= 1
+                # Outermost text blocks only, so nested blocks are not counted twice
+                if block_depth == 0 and skip_depth == 0 and (main_depth > 0 or not main_seen):
+                    text = ' '.join(''.join(element.itertext()).split())
+                    if text:
+                        parts.append(text)
+                        collected += len(text) + 1
+            
+            if block_depth == 0:
+                element.clear()
+        
+        parse_seconds += time.perf_counter() - parse_start
+        if collected >= MAX_CONTENT_CHARS or downloaded >= MAX_PAGE_BYTES:
+            break
+    
+    content = ' '.join(parts)[:MAX_CONTENT_CHARS]
+    if not content:
+        # No text blocks (e.g. an article built from <div>s) - parse what was downloaded as a whole
+        parse_start = time.perf_counter()
+        content = extract_text_full(b''.join(chunks))
+        parse_seconds += time.perf_counter() - parse_start
+    
+    if span is not None:
+        span.set(bytes=downloaded, parse_seconds=round(parse_seconds, 4))
+    return content
+
+def sniff_encoding(chunk):
+    """Encoding of a page sent without a charset: its <meta> declaration, else UTF-8 if the start decodes as it"""
+    declared = EncodingDetector.find_declared_encoding(chunk, is_html=True)
+    if declared:
+        return declared
+    try:
+        # Incremental, so a multi-byte character cut at the chunk end is not an error
+        codecs.getincrementaldecoder('utf-8')().decode(chunk)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return None
+
+def format_source(snippet, content):
+    """Source text passed to fact analysis: search snippet plus page content"""
+    return f"{snippet}\n\n{content}" if content else snippet
+
+def analyze_facts(content, topic, client, use_cache=True, on_error=None, trace=None):
+    """Analyze facts using Claude"""
+    
+    prompt = f"""
+    Przeanalizuj poniższe treści dotyczące tematu "{topic}" i wyciągnij najważniejsze fakty.
+    
+    Treści:
+    {content}
+    
+    Przedstaw fakty w formie listy punktów. Skup się na:
+    - Kluczowych definicjach i objawach
+    - Przyczynach problemu
+    - Skutecznych metodach leczenia
+    - Praktycznych wskazówkach
+    - Statystykach i danych naukowych
+    
+    Format odpowiedzi: krótkie, konkretne punkty w stylu lifestyle'owym, przyjazne dla czytelnika.
+    """
+    
+    try:
+        with trace_span(trace, "analyze_facts") as span:
+            response = create_message(
+                client,
+                model="claude-3-7-sonnet-20250219",
+                max_tokens=1500,
+                messages=[{"role": "user", "content": prompt}],
+                use_cache=use_cache
+            )
+            span.add_usage(response)
+        return response.content[0].text
+    except Exception as e:
+        report_error(on_error, f"Błąd analizy faktów: {e}")
+        return ""
+
+def create_outline(topic, facts, target_words, client, competition=None, use_cache=True, on_error=None, trace=None):
+    """Create article outline"""
+    
+    competition_info = ""
+    if competition:
+        competition_info = "\n    ARTYKUŁY KONKURENCJI (nie kopiuj - pokryj luki i wyróżnij się):\n"
+        for item in competition:
+            competition_info += f"    - {item['title']}: {item['snippet']}\n"
+    
+    prompt = f"""
+    Na podstawie poniższych faktów o temacie "{topic}", stwórz konspekt artykułu lifestyle'owego zoptymalizowanego pod SEO.
+
+    Fakty:
+    {facts}
+    {competition_info}
+
+    WYMAGANIA:
+    1. Tytuł główny (H1) - atrakcyjny, SEO-friendly, zawierający główne słowo kluczowe
+    2. Krótki wstęp (3-5 zdań) - zajawka bez użycia zwrotów typu "w tym artykule", z naturalnym hookiem.
+    3. 5-7 śródtytułów (H2) - zróżnicowanych, zawierających long-tail keywords
+    4. Dla każdego H2 krótki opis treści (1-2 zdania)
+    5. Cel: około {target_words} słów w całym artykule
+    6. Styl: przyjazny, lifestyle'owy, praktyczny, user-friendly. Wciel się w rolę pomocnego przewodnika po temacie.
+    7. Wyeliminuj wszelkie słowa i zwroty, które mogą świadczyć o AI, takie jak: kluczowy, innowacyjny, holistyczny, nowatorski itp. 
+
+    Format markdown:
+    # Główny tytuł H1
+    
+    [Wstęp 3-5 zdań bez "w tym artykule"]
+    
+    ## 1. Pierwszy śródtytuł H2
+    Opis: Co będzie w tej sekcji...
+    
+    ## 2. Drugi śródtytuł H2  
+    Opis: Co będzie w tej sekcji...
+    
+    STRUKTURA POWINNA BYĆ UROZMAICONA - niektóre sekcje mogą zawierać listy punktowane, ale tylko tam, gdzie to zasadne.
+    """
+    
+    try:
+        with trace_span(trace, "create_outline") as span:
+            response = create_message(
+                client,
+                model="claude-3-5-sonnet-20241022",
+                max_tokens=1500,
+                messages=[{"role": "user", "content": prompt}],
+                use_cache=use_cache
+            )
+            span.add_usage(response)
+        return response.content[0].text
+    except Exception as e:
+        report_error(on_error, f"Błąd tworzenia konspektu: {e}")
+        return ""
+
+def write_section(topic, outline, facts, section_title, written_sections, remaining_sections, target_words, matching_products, client, section_description=None, other_sections=None, usage_log=None, use_cache=True, on_error=None, trace=None):
+    """Write article section"""
+    
+    prompt = build_section_prompt(
+        topic, outline, facts, section_title, written_sections,
+        remaining_sections, target_words, matching_products,
+        section_description, other_sections
+    )
+    
+    try:
+        with trace_span(trace, "write_section", section=section_title) as span:
+            response = create_message(
+                client,
+                model="claude-3-7-sonnet-20250219",
+                max_tokens=2500,
+                messages=[{"role": "user", "content": prompt}],
+                use_cache=use_cache
+            )
+            span.add_usage(response)
+        record_usage(usage_log, section_title, response)
+        return response.content[0].text
+    except Exception as e:
+        report_error(on_error, f"Błąd pisania sekcji: {e}")
+        return ""
+
+def write_section_stream(topic, outline, facts, section_title, written_sections, remaining_sections, target_words, matching_products, client, usage_log=None, use_cache=True, on_error=None, trace=None):
+    """Write article section, yielding text chunks as Claude produces them"""
+    
+    prompt = build_section_prompt(
+        topic, outline, facts, section_title, written_sections,
+        remaining_sections, target_words, matching_products
+    )
+    
+    def on_complete(response):
+        record_usage(usage_log, section_title, response)
+        span.add_usage(response)
+    
+    try:
+        with trace_span(trace, "write_section", section=section_title, stream=True) as span:
+            yield from stream_message(
+                client,
+                model="claude-3-7-sonnet-20250219",
+                max_tokens=2500,
+                messages=[{"role": "user", "content": prompt}],
+                use_cache=use_cache,
+                on_complete=on_complete
+            )
+    except Exception as e:
+        report_error(on_error, f"Błąd pisania sekcji: {e}")
+
+def build_section_prompt(topic, outline, facts, section_title, written_sections, remaining_sections, target_words, matching_products, section_description=None, other_sections=None):
+    """Build the prompt content blocks for one article section"""
+    
+    products_info = ""
+    if matching_products:
+        products_info = "\n\nDOSTĘPNE PRODUKTY DR AMBROZIAK (rekomenduj subtelnie gdzie pasuje):\n"
+        for product in matching_products:
+            similarity_info = f" (podobieństwo: {product['similarity']:.1%})" if 'similarity' in product else ""
+            products_info += f"- {product['nazwa']}: {product['opis'][:150]}... - {product['zastosowanie']} - {product['url']}{similarity_info}\n"
+    
+    section_target = target_words // len(re.findall(r'## (?:\d+\.\s*)?(.+)', outline)) if outline else 300
+    
+    if other_sections is not None:
+        # Parallel mode - the other sections are being written at the same time
+        context_info = f"""ZAKRES TEJ SEKCJI:
+    {section_description or section_title}
+
+    POZOSTAŁE SEKCJE (pisane równolegle - NIE poruszaj ich zakresu):
+    {other_sections if other_sections else "Brak - to jedyna sekcja"}"""
+    else:
+        context_info = f"""CO JUŻ ZOSTAŁO NAPISANE:
+    {written_sections if written_sections else "To jest pierwsza sekcja"}
+
+    CO BĘDZIE NAPISANE PÓŹNIEJ:
+    {remaining_sections if remaining_sections else "To jest ostatnia sekcja"}"""
+    
+    # Stable prefix - identical for every section of the article, cached by Anthropic
+    article_context = f"""
+    Napisz treść sekcji artykułu lifestyle'owego dla sklepu drambroziak.com.
+
+    TEMAT GŁÓWNY: {topic}
+    CEL SŁÓW CAŁEGO ARTYKUŁU: {target_words}
+    CEL SŁÓW JEDNEJ SEKCJI: {section_target}
+
+    KONSPEKT CAŁEGO ARTYKUŁU:
+    {outline}
+
+    DOSTĘPNE FAKTY:
+    {facts}
+
+    WYMAGANIA:
+    - Napisz odpowiednią ilość treści (patrz cel słów dla sekcji)
+    - Styl: przyjazny, lifestyle'owy, praktyczny, user-friendly
+    - NIE powtarzaj informacji z już napisanych sekcji
+    - NIE wyprzedzaj treści z przyszłych sekcji
+    - Używaj konkretnych faktów z dostępnych danych
+    - STRUKTURA: akapity + listy punktowane tam gdzie zasadne (dla lepszej czytelności)
+    - Jeśli znajdziesz naturalne miejsce, subtelnie wspomniej o produkcie Dr Ambroziak (bez forsowania!)
+    - Format: markdown (bez nagłówka H2 - zostanie dodany automatycznie)
+    - Używaj pogrubień **tekst** dla kluczowych pojęć
+    - Wyeliminuj wszelkie słowa i zwroty, które mogą świadczyć o AI, takie jak: kluczowy, innowacyjny, holistyczny, nowatorski itp.
+    """
+    
+    # Variable suffix - changes with every section
+    section_task = f"""
+    ŚRÓDTYTUŁ SEKCJI: {section_title}
+
+    {context_info}
+    
+    {products_info}
+
+    Zwróć TYLKO treść sekcji, bez dodatkowych komentarzy.
+    """
+    
+    return [
+        {"type": "text", "text": article_context, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": section_task}
+    ]
+
+def record_usage(usage_log, stage, response):
+    """Append input/output token counts of one Claude call, split into cached and uncached"""
+    if usage_log is None:
+        return
+    usage = response.usage
+    entry = {
+        'stage': stage,
+        'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+        'cache_write_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+        'cache_read_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0,
+        'output_tokens': getattr(usage, 'output_tokens', 0) or 0,
+        'response_cache_hit': getattr(response, 'from_cache', False)
+    }
+    entry['prompt_tokens'] = entry['input_tokens'] + entry['cache_write_tokens'] + entry['cache_read_tokens']
+    usage_log.append(entry)
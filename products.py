@@ -1,9 +1,192 @@
-import streamlit as st
 import pickle
 import os
 import anthropic
-from sklearn.feature_extraction.text import TfidfVectorizer
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from clients import get_openai_client
+from llm import create_message
+from ratelimit import get_rate_limiter
+
+# Model used to build the vectors stored in dr_ambroziak_embeddings.pkl (1536 dims). Queries must be
+# embedded with the same model - vectors of another model live in a different space
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Embedding matches are cut relative to each query: a product must beat the query's mean cosine
+# over the whole catalog by this margin. Most of the catalog is unrelated to any one query, so the
+# mean is its unrelated baseline, whatever the query length. Product pairs sharing a 'zastosowanie'
+# tag score about 0.09 above pairs sharing none (p50 0.65 vs 0.56)
+EMBEDDING_MARGIN = 0.1
+
+# Absolute cosine floors on top of the margin - keyword overlap thresholds are on a different scale
+EMBEDDING_THRESHOLD = 0.45
+PARAGRAPH_EMBEDDING_THRESHOLD = 0.55
+
+# Number of catalogs whose search structures are kept in memory
+MAX_CACHED_INDEXES = 8
+
+# Texts scored per sparse product in batch keyword matching - bounds the texts x products intermediate
+KEYWORD_BATCH_SIZE = 128
+
+# Default cap on concurrent suggestion requests in bulk generation
+MAX_SUGGESTION_WORKERS = 5
+
+_product_indexes = {}
+
+class ProductIndex:
+    """Search structures precomputed once per products catalog"""
+
+    def __init__(self, products):
+        self.products = products
+        self.size = len(products)
+        self.embeddings = None
+        self.embedding_ids = None
+        self.vectorizer = None
+        self.keyword_matrix = None
+        self.keyword_lengths = None
+        self.postings = {}
+        self.token_counts = []
+
+        vectors = []
+        ids = []
+        for i, product in enumerate(products):
+            embedding = product.get('embedding')
+            if embedding is None or len(embedding) == 0:
+                continue
+            if vectors and len(embedding) != len(vectors[0]):
+                continue
+            vectors.append(embedding)
+            ids.append(i)
+
+        if vectors:
+            # One contiguous, L2-normalized matrix - a query is scored with a single dot product
+            matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.embeddings = matrix / norms
+            self.embedding_ids = np.asarray(ids, dtype=np.intp)
+
+        # Inverted index: token -> ids of products containing it, plus distinct token counts
+        product_texts = [f"{product['nazwa']} {product['zastosowanie']}" for product in products]
+        for i, product_text in enumerate(product_texts):
+            product_words = set(product_text.lower().split())
+            self.token_counts.append(len(product_words))
+            for word in product_words:
+                self.postings.setdefault(word, []).append(i)
+
+        # Binary product x word matrix, same tokens as the keyword matcher (lower().split())
+        if any(text.split() for text in product_texts):
+            self.vectorizer = CountVectorizer(binary=True, lowercase=True, tokenizer=str.split, token_pattern=None)
+            product_words = self.vectorizer.fit_transform(product_texts).tocsr()
+            self.keyword_matrix = product_words.T.tocsr()
+            self.keyword_lengths = np.maximum(np.diff(product_words.indptr), 5)
+
+    def top_matches(self, query_vector, threshold, limit=5, margin=0.0):
+        """Return the best product copies for a normalized query vector"""
+        scores = self.embeddings @ query_vector
+        threshold = max(threshold, float(scores.mean()) + margin)
+        k = min(limit, len(scores))
+        if k <= 0:
+            return []
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        matches = []
+        for row in top:
+            similarity = float(scores[row])
+            if similarity < threshold:
+                break
+            matches.append(_product_match(self.products[self.embedding_ids[row]], similarity))
+        return matches
+
+    def keyword_matches(self, content, threshold, limit=5):
+        """Keyword overlap scoring that only visits postings of the query tokens"""
+        common_counts = {}
+        for word in set(content.lower().split()):
+            for product_id in self.postings.get(word, ()):
+                common_counts[product_id] = common_counts.get(product_id, 0) + 1
+
+        scored = []
+        for product_id, common in common_counts.items():
+            if common >= 2:  # At least 2 common words
+                similarity = common / max(self.token_counts[product_id], 5)
+                if similarity >= threshold:
+                    scored.append((similarity, product_id))
+
+        # Sort by similarity, ties in catalog order
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [_product_match(self.products[product_id], similarity) for similarity, product_id in scored[:limit]]
+
+    def batch_top_matches(self, query_vectors, threshold, limit=5, margin=0.0):
+        """Score all normalized query vectors in one matrix product"""
+        scores = query_vectors @ self.embeddings.T
+        thresholds = np.maximum(threshold, scores.mean(axis=1) + margin)
+        return [
+            self._ranked(row, row >= row_threshold, self.embedding_ids, limit)
+            for row, row_threshold in zip(scores, thresholds)
+        ]
+
+    def batch_keyword_matches(self, texts, threshold, limit=5):
+        """Keyword overlap of all texts against the catalog in one sparse product"""
+        if self.vectorizer is None:
+            return [[] for _ in texts]
+        matches = []
+        for start in range(0, len(texts), KEYWORD_BATCH_SIZE):
+            queries = self.vectorizer.transform(texts[start:start + KEYWORD_BATCH_SIZE])
+            # Sparse texts x products counts of common words - only overlapping pairs are stored
+            common = (queries @ self.keyword_matrix).tocsr()
+            common.sort_indices()
+            for i in range(common.shape[0]):
+                row = slice(common.indptr[i], common.indptr[i + 1])
+                product_ids = common.indices[row]
+                counts = common.data[row]
+                similarity = counts / self.keyword_lengths[product_ids]
+                eligible = (counts >= 2) & (similarity >= threshold)
+                matches.append(self._ranked(similarity, eligible, product_ids, limit))
+        return matches
+
+    def _ranked(self, scores, eligible, product_ids, limit):
+        """Top eligible scores, ties kept in catalog order"""
+        candidates = np.flatnonzero(eligible)
+        order = candidates[np.argsort(-scores[candidates], kind='stable')][:limit]
+        return [
+            _product_match(self.products[product_ids[j] if product_ids is not None else j], float(scores[j]))
+            for j in order
+        ]
+
+def get_product_index(products_db):
+    """Return the ProductIndex of a catalog, building it on first use"""
+    entry = _product_indexes.get(id(products_db))
+    if entry is not None and entry[0] is products_db and entry[1].size == len(products_db):
+        return entry[1]
+
+    index = ProductIndex(products_db)
+    if len(_product_indexes) >= MAX_CACHED_INDEXES:
+        _product_indexes.pop(next(iter(_product_indexes)))
+    _product_indexes[id(products_db)] = (products_db, index)
+    return index
+
+def embed_texts(texts, api_key):
+    """Embed texts with OpenAI in one request and return L2-normalized rows"""
+    response = get_rate_limiter("openai").call(
+        get_openai_client(api_key).embeddings.create, model=EMBEDDING_MODEL, input=texts
+    )
+    vectors = np.asarray([item.embedding for item in response.data], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _product_match(product, similarity):
+    """Copy of a product annotated for the generator and analyzer"""
+    product_copy = product.copy()
+    product_copy['similarity'] = similarity
+    # Add opis field for generator compatibility
+    product_copy['opis'] = product.get('zastosowanie', 'Brak opisu')
+    return product_copy
 
 # Simple product matching - backward compatibility
 def find_matching_products(topic, section_title, products_db, api_key, threshold=0.3):
@@ -12,59 +195,67 @@ def find_matching_products(topic, section_title, products_db, api_key, threshold
         return []
     
     # Combine topic and section for better matching
-    content = f"{topic} {section_title}".lower()
-    matching_products = []
+    content = f"{topic} {section_title}"
+    return get_product_index(products_db).keyword_matches(content, threshold)
+
+# Dense matching on the precomputed product embeddings
+def find_matching_products_by_embedding(topic, section_title, products_db, api_key, threshold=0.3,
+                                        embedding_threshold=EMBEDDING_THRESHOLD, embedding_margin=EMBEDDING_MARGIN):
+    """Find products by cosine similarity of embeddings, keyword matching as fallback"""
+    if not products_db:
+        return []
     
-    for product in products_db:
-        # Simple keyword matching
-        product_text = f"{product['nazwa']} {product['zastosowanie']}".lower()
-        
-        # Count matching words
-        content_words = set(content.split())
-        product_words = set(product_text.split())
-        common_words = content_words & product_words
-        
-        if len(common_words) >= 2:  # At least 2 common words
-            similarity = len(common_words) / max(len(product_words), 5)
-            
-            if similarity >= threshold:
-                product_copy = product.copy()
-                product_copy['similarity'] = similarity
-                # Add opis field for generator compatibility
-                product_copy['opis'] = product.get('zastosowanie', 'Brak opisu')
-                matching_products.append(product_copy)
+    index = get_product_index(products_db)
+    if not api_key or index.embeddings is None:
+        return find_matching_products(topic, section_title, products_db, api_key, threshold)
+    
+    try:
+        query_vector = embed_texts([f"{topic} {section_title}".strip()], api_key)[0]
+    except Exception:
+        return find_matching_products(topic, section_title, products_db, api_key, threshold)
     
-    # Sort by similarity
-    matching_products.sort(key=lambda x: x['similarity'], reverse=True)
-    return matching_products[:5]
+    return index.top_matches(query_vector, embedding_threshold, margin=embedding_margin)
 
-# Simple analysis function
-# Replace the analyze_text_for_products function in products.py with this corrected version:
+# Batch matching - one vectorized pass for many texts
+def find_matching_products_batch(texts, products_db, api_key=None, threshold=0.3,
+                                 embedding_threshold=EMBEDDING_THRESHOLD, embedding_margin=EMBEDDING_MARGIN):
+    """Find matching products for every text, scoring texts x products at once"""
+    if not texts or not products_db:
+        return [[] for _ in texts]
+    
+    index = get_product_index(products_db)
+    if api_key and index.embeddings is not None:
+        try:
+            return index.batch_top_matches(embed_texts(texts, api_key), embedding_threshold, margin=embedding_margin)
+        except Exception:
+            pass
+    
+    # Same result as find_matching_products(text, "", ...) for every text
+    return index.batch_keyword_matches(texts, threshold)
 
+# Simple analysis function
 def analyze_text_for_products(text, produkty_db, api_key=None):
     """Simple analysis that finds product opportunities"""
     if not text or not produkty_db:
         return []
     
     paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-    recommendations = []
     
-    for i, paragraph in enumerate(paragraphs):
-        # Skip very short paragraphs
-        if len(paragraph.split()) < 10:
-            continue
-        
+    # Skip very short paragraphs
+    candidates = [(i, paragraph) for i, paragraph in enumerate(paragraphs) if len(paragraph.split()) >= 10]
+    all_matches = find_matching_products_batch(
+        [paragraph for _, paragraph in candidates], produkty_db, api_key,
+        threshold=0.2, embedding_threshold=PARAGRAPH_EMBEDDING_THRESHOLD
+    )
+    
+    recommendations = []
+    for (i, paragraph), matches in zip(candidates, all_matches):
         # Skip paragraphs that are only about symptoms
         paragraph_lower = paragraph.lower()
         if any(symptom in paragraph_lower for symptom in ['objawy', 'symptomy', 'charakteryzują się', 'pojawiają się']) and \
            not any(solution in paragraph_lower for solution in ['leczenie', 'terapia', 'stosować', 'pomocne', 'warto']):
             continue
         
-        # FIX: Call find_matching_products with correct parameters
-        # Changed from: find_matching_products(paragraph, produkty_db, threshold=0.2)
-        # To: find_matching_products(paragraph, "", produkty_db, api_key, threshold=0.2)
-        matches = find_matching_products(paragraph, "", produkty_db, api_key, threshold=0.2)
-        
         for product in matches[:2]:  # Max 2 per paragraph
             recommendations.append({
                 'paragraph_index': i + 1,
@@ -77,7 +268,7 @@ def analyze_text_for_products(text, produkty_db, api_key=None):
     return recommendations
 
 # Product content generation
-def generate_product_content(product, content_type, client):
+def generate_product_content(product, content_type, client, use_cache=True):
     """Generate content for a product"""
     try:
         if content_type == "opis":
@@ -126,11 +317,13 @@ Napisz krótki, chwytliwy post (2-3 zdania) z:
 Styl: przyjazny, zachęcający, autentyczny.
 """
 
-        message = client.messages.create(
+        message = create_message(
+            client,
             model="claude-3-7-sonnet-20250219",
             max_tokens=500,
             temperature=0.7,
-            messages=[{"role": "user", "content": prompt}]
+            messages=[{"role": "user", "content": prompt}],
+            use_cache=use_cache
         )
         
         return message.content[0].text.strip()
@@ -139,7 +332,7 @@ Styl: przyjazny, zachęcający, autentyczny.
         return f"Błąd generowania treści: {e}"
 
 # Product suggestion generation
-def generate_product_suggestion(paragraph_text, product, suggestion_type, anthropic_client):
+def generate_product_suggestion(paragraph_text, product, suggestion_type, anthropic_client, use_cache=True):
     """Generate contextual product suggestion"""
     
     prompt = f"""
@@ -167,11 +360,13 @@ Odpowiedz TYLKO przeredagowanym akapitem lub "PRODUKT_NIE_PASUJE_DO_KONTEKSTU".
 """
 
     try:
-        message = anthropic_client.messages.create(
+        message = create_message(
+            anthropic_client,
             model="claude-3-7-sonnet-20250219",
             max_tokens=600,
             temperature=0.2,
-            messages=[{"role": "user", "content": prompt}]
+            messages=[{"role": "user", "content": prompt}],
+            use_cache=use_cache
         )
         
         return message.content[0].text.strip()
@@ -179,6 +374,23 @@ Odpowiedz TYLKO przeredagowanym akapitem lub "PRODUKT_NIE_PASUJE_DO_KONTEKSTU".
     except Exception as e:
         return f"Błąd generowania sugestii: {e}"
 
+def generate_product_suggestions(recommendations, anthropic_client, max_workers=MAX_SUGGESTION_WORKERS, use_cache=True):
+    """Generate suggestions for (index, recommendation) pairs concurrently, yielding (index, suggestion) as each finishes"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                generate_product_suggestion,
+                rec['paragraph_text'],
+                rec['product'],
+                rec.get('suggestion_type', 'general'),
+                anthropic_client,
+                use_cache
+            ): i
+            for i, rec in recommendations
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
 # Filter recommendations
 def filter_recommendations_by_quality(recommendations, min_threshold=0.4):
     """Filter out recommendations with very poor thematic relevance"""
@@ -196,8 +408,12 @@ def filter_recommendations_by_quality(recommendations, min_threshold=0.4):
     return filtered
 
 # Load products database
-def load_products_database():
-    """Load products database from embeddings file"""
+def read_products_database():
+    """Load products database from embeddings file, without any UI calls
+    
+    Returns (products, loaded, status) - status is a (level, message) pair for the
+    caller to show, level being 'success', 'warning' or 'error'.
+    """
     try:
         # Try to load from embeddings pickle file
         if os.path.exists('dr_ambroziak_embeddings.pkl'):
@@ -224,19 +440,16 @@ def load_products_database():
                 products = [item for item in data if isinstance(item, dict) and 'nazwa' in item]
             
             if products:
-                st.success(f"✅ Wczytano {len(products)} produktów z bazy embeddings")
-                return products, True
+                get_product_index(products)
+                return products, True, ('success', f"✅ Wczytano {len(products)} produktów z bazy embeddings")
             else:
-                st.warning("⚠️ Plik embeddings nie zawiera danych produktów w oczekiwanym formacie.")
-                return get_demo_products(), True
+                return get_demo_products(), True, ('warning', "⚠️ Plik embeddings nie zawiera danych produktów w oczekiwanym formacie.")
                 
         else:
-            st.warning("⚠️ Plik dr_ambroziak_embeddings.pkl nie został znaleziony.")
-            return get_demo_products(), True
+            return get_demo_products(), True, ('warning', "⚠️ Plik dr_ambroziak_embeddings.pkl nie został znaleziony.")
             
     except Exception as e:
-        st.error(f"❌ Błąd wczytywania bazy produktów: {e}")
-        return get_demo_products(), True
+        return get_demo_products(), True, ('error', f"❌ Błąd wczytywania bazy produktów: {e}")
 
 def get_demo_products():
     """Return demo products for testing"""
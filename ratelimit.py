@@ -0,0 +1,157 @@
+import os
+import random
+import threading
+import time
+import anthropic
+import requests
+from resources import shared_resource
+
+# ========================================
+# RATE LIMIT SETTINGS
+# ========================================
+
+# Default requests per second and burst size per API - the adaptive rate never exceeds these.
+# Set <API>_RPM and <API>_BURST (e.g. ANTHROPIC_RPM=1000) to match the account's tier
+API_LIMITS = {
+    'anthropic': {'rate': 50 / 60, 'burst': 5},
+    'google': {'rate': 100 / 60, 'burst': 10},
+    # Embeddings only refine product matching - a failed call falls back to keywords at once
+    'openai': {'rate': 3000 / 60, 'burst': 10, 'max_retries': 0}
+}
+
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504, 529)
+THROTTLE_STATUSES = (429, 529)
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0               # First retry waits up to 1s, then 2s, 4s...
+BACKOFF_MAX = 60.0
+MIN_RATE_FRACTION = 0.1          # Throttling never slows an API below 10% of its rate
+RATE_DECREASE = 0.5              # Rate multiplier after a throttled response
+RATE_INCREASE = 0.05             # Share of the configured rate regained per success
+
+class RateLimiter:
+    """Token bucket with adaptive rate (AIMD) and jittered exponential backoff retries"""
+
+    def __init__(self, name, rate, burst, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0
+        self.calls = 0
+        self.retries = 0
+        self.throttles = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.calls += 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def call(self, func, *args, **kwargs):
+        """Call func under the limiter, retrying throttled and transient failures"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                status, retry_after = error_details(e)
+                if not is_retryable(e, status):
+                    raise
+                if status in THROTTLE_STATUSES:
+                    self.on_throttle(retry_after)
+                if attempt == self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+
+                with self._lock:
+                    self.retries += 1
+                time.sleep(min(retry_after, self.backoff_max) if retry_after is not None else self.backoff(attempt))
+                continue
+
+            self.on_success()
+            return result
+
+    def backoff(self, attempt):
+        """Full-jitter exponential delay, so concurrent callers don't retry in lockstep"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def on_throttle(self, retry_after=None):
+        """Slow down after a 429/529 and hold all callers for Retry-After"""
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate * RATE_DECREASE)
+            self.tokens = min(self.tokens, 0)
+            if retry_after is not None:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + min(retry_after, self.backoff_max))
+
+    def on_success(self):
+        """Recover the rate gradually after throttling"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_INCREASE)
+
+    def stats(self):
+        """Counters of this process and the current adaptive rate"""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'throttles': self.throttles,
+                'failures': self.failures,
+                'rate': self.rate,
+                'max_rate': self.max_rate
+            }
+
+def error_details(error):
+    """HTTP status and Retry-After seconds of an Anthropic or requests exception"""
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    headers = getattr(response, 'headers', None) or {}
+    return status, parse_retry_after(headers.get('retry-after'))
+
+def parse_retry_after(value):
+    """Retry-After in seconds, or None if missing or given as an HTTP date"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error, status):
+    """Throttling, overload, server errors and dropped connections are worth retrying"""
+    if status is not None:
+        return status in RETRY_STATUSES
+    return isinstance(error, (anthropic.APIConnectionError, requests.ConnectionError, requests.Timeout))
+
+@shared_resource
+def get_rate_limiter(name):
+    """Limiter for one API, shared by all sessions and worker threads"""
+    return RateLimiter(name, **api_limits(name))
+
+def api_limits(name):
+    """Limits of one API: API_LIMITS overridden by <NAME>_RPM and <NAME>_BURST from the environment"""
+    limits = dict(API_LIMITS[name])
+    rpm = os.environ.get(f"{name.upper()}_RPM")
+    burst = os.environ.get(f"{name.upper()}_BURST")
+    if rpm:
+        limits['rate'] = float(rpm) / 60
+    if burst:
+        limits['burst'] = int(burst)
+    return limits
@@ -0,0 +1,19 @@
+"""Process-wide shared objects without Streamlit, so the pipeline also runs in scripts and workers"""
+import functools
+import threading
+
+def shared_resource(func):
+    """Like st.cache_resource: one object per arguments, shared by all threads and sessions"""
+    instances = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        with lock:
+            if key not in instances:
+                instances[key] = func(*args, **kwargs)
+            return instances[key]
+
+    wrapper.clear = instances.clear
+    return wrapper
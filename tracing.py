@@ -0,0 +1,132 @@
+"""Per-stage timing and token spans of a generation run, logged as JSON lines"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import numpy as np
+from cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# TRACE SETTINGS
+# ========================================
+
+TRACE_LOG_PATH = os.environ.get("TRACE_LOG_PATH", os.path.join(CACHE_DIR, "traces.jsonl"))
+TRACE_STATS_MAX_SPANS = 5000     # Percentiles are computed over the most recent spans only
+TRACE_LOG_MAX_BYTES = 5 * 1024 * 1024  # Larger logs are cut down to the most recent spans
+
+_log_lock = threading.Lock()
+
+class Span:
+    """One timed stage with its token counts and cache hits"""
+
+    def __init__(self, stage, **attrs):
+        self.stage = stage
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.seconds = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add_usage(self, response):
+        """Token counts of a Claude response; memoized responses count as a cache hit"""
+        usage = response.usage
+        self.attrs['input_tokens'] = self.attrs.get('input_tokens', 0) + (getattr(usage, 'input_tokens', 0) or 0)
+        self.attrs['output_tokens'] = self.attrs.get('output_tokens', 0) + (getattr(usage, 'output_tokens', 0) or 0)
+        self.attrs['cache_read_tokens'] = self.attrs.get('cache_read_tokens', 0) + (getattr(usage, 'cache_read_input_tokens', 0) or 0)
+        self.attrs['cache_write_tokens'] = self.attrs.get('cache_write_tokens', 0) + (getattr(usage, 'cache_creation_input_tokens', 0) or 0)
+        self.attrs['cache_hit'] = bool(getattr(response, 'from_cache', False))
+
+    def to_dict(self):
+        return {'stage': self.stage, 'seconds': self.seconds, 'started_at': self.started_at, **self.attrs}
+
+class Trace:
+    """Spans of one generation run, recorded from any thread"""
+
+    def __init__(self, **attrs):
+        self.run_id = uuid.uuid4().hex
+        self.attrs = attrs
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        """Time the enclosed block as one span"""
+        span = Span(stage, **attrs)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=str(e))
+            raise
+        finally:
+            span.seconds = round(time.perf_counter() - start, 4)
+            with self._lock:
+                self.spans.append(span)
+
+    def to_list(self):
+        with self._lock:
+            return [span.to_dict() for span in self.spans]
+
+    def write(self, path=TRACE_LOG_PATH):
+        """Append all spans to the JSON lines log"""
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with _log_lock:
+                with open(path, "a", encoding="utf-8") as f:
+                    for span in self.to_list():
+                        f.write(json.dumps({'run_id': self.run_id, **self.attrs, **span}, ensure_ascii=False) + "\n")
+                if os.path.getsize(path) > TRACE_LOG_MAX_BYTES:
+                    truncate_log(path)
+        except OSError as e:
+            logger.warning("Cannot write trace log %s: %s", path, e)
+
+def truncate_log(path, max_spans=TRACE_STATS_MAX_SPANS):
+    """Keep only the spans that stage_percentiles still reads"""
+    with open(path, encoding="utf-8") as f:
+        lines = deque(f, maxlen=max_spans)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(temp_path, path)
+
+def trace_span(trace, stage, **attrs):
+    """trace.span(...) or, without a trace, a span that is never recorded"""
+    if trace is None:
+        return nullcontext(Span(stage, **attrs))
+    return trace.span(stage, **attrs)
+
+def stage_percentiles(path=TRACE_LOG_PATH, max_spans=TRACE_STATS_MAX_SPANS):
+    """p50/p95 wall time per stage over the most recent logged spans"""
+    if not os.path.exists(path):
+        return []
+
+    with open(path, encoding="utf-8") as f:
+        lines = deque(f, maxlen=max_spans)
+
+    durations = {}
+    for line in lines:
+        try:
+            span = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if span.get('seconds') is not None:
+            durations.setdefault(span['stage'], []).append(span['seconds'])
+
+    return [
+        {
+            'stage': stage,
+            'count': len(values),
+            'p50': round(float(np.percentile(values, 50)), 3),
+            'p95': round(float(np.percentile(values, 95)), 3)
+        }
+        for stage, values in sorted(durations.items())
+    ]